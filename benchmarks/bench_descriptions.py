@@ -0,0 +1,83 @@
+#!/bin/python3
+
+# Compares the description renderer (parse_brief) with the previous implementation,
+# which only handled two levels of xml and called the text functions for each child.
+# usage: python benchmarks/bench_descriptions.py [number of paragraphs] [repeats]
+
+import os
+import sys
+import timeit
+
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from DoxygenToRST import DoxygenToRST as d2r
+from DoxygenToRST.RST_Writer import RST_Writer
+
+
+# previous implementation, kept here as reference
+def parse_brief_legacy(writer, brief_xml):
+    if brief_xml!=None:
+        for child in brief_xml:
+            if child.text:
+                writer+= d2r.make_cpp_code_to_text(d2r.remove_excess_white_spaces(child.text)) + " " or " "
+            for c in child:
+                if c.tag=="ref":
+                    refid=c.get("refid")
+                    writer+= f":ref:`{d2r.make_cpp_code_to_text(c.text)} <{refid}>`" + " "
+                if c.tag=="verbatim":
+                    writer+= d2r.make_cpp_code_to_text(d2r.remove_excess_white_spaces(c.text)) + " "
+                if c.tail:
+                    writer+= d2r.make_cpp_code_to_text(d2r.remove_excess_white_spaces(c.tail)) + " "
+        writer.newline()
+    return writer
+
+# long detailed description, similar to the ones of the big TRUST classes.
+# Without markup, only text and refs are used (what the previous implementation supports)
+def make_description(n_paragraphs, markup=True):
+    paragraphs=[]
+    for i in range(n_paragraphs):
+        if not markup:
+            paragraphs.append(
+                f"<para>Paragraph {i} of the description of <ref refid=\"classField__{i}\" kindref=\"compound\">Field_{i}</ref>, "
+                f"computing a_{i} = b_{i} * c for each   element\n of the domain, "
+                f"see <ref refid=\"classDomain_1a{i}\" kindref=\"member\">Domain::compute</ref> for details.</para>"
+            )
+            continue
+        paragraphs.append(
+            f"<para>Paragraph {i} of the description of <ref refid=\"classField__{i}\" kindref=\"compound\">Field_{i}</ref>, "
+            f"computing <computeroutput>a_{i} = b_{i} * c</computeroutput> for each   element\n of the domain, "
+            f"see <ref refid=\"classDomain_1a{i}\" kindref=\"member\">Domain::compute</ref> for details."
+            f"<itemizedlist><listitem><para>first case with <bold>{i}</bold> values</para></listitem>"
+            f"<listitem><para>second case, <emphasis>not</emphasis> handled</para></listitem></itemizedlist>"
+            f"<parameterlist kind=\"param\"><parameteritem><parameternamelist><parametername>x_{i}</parametername></parameternamelist>"
+            f"<parameterdescription><para>the input field</para></parameterdescription></parameteritem></parameterlist>"
+            f"<simplesect kind=\"return\"><para>the <ref refid=\"classField__{i}\" kindref=\"compound\">Field_{i}</ref></para></simplesect></para>"
+        )
+    return ET.fromstring(f"<detaileddescription>{''.join(paragraphs)}</detaileddescription>")
+
+def bench(function, xml, repeats):
+    def render():
+        writer=RST_Writer()
+        function(writer, xml)
+        return writer.printout()
+    return min(timeit.repeat(render, number=1, repeat=repeats)), len(render())
+
+if __name__ == "__main__":
+    n_paragraphs=int(sys.argv[1]) if len(sys.argv)>1 else 200
+    repeats=int(sys.argv[2]) if len(sys.argv)>2 else 20
+
+    session=d2r.Converter()
+    def parse_brief(writer, xml):
+        return d2r.parse_brief(writer, xml, session)
+
+    for markup in [False, True]:
+        xml=make_description(n_paragraphs, markup)
+        legacy_time, legacy_size=bench(parse_brief_legacy, xml, repeats)
+        new_time, new_size=bench(parse_brief, xml, repeats)
+
+        print(f"description with {n_paragraphs} paragraphs {'with' if markup else 'without'} markup, best of {repeats}")
+        print(f"  legacy parse_brief: {legacy_time*1e3:8.2f} ms, {legacy_size:>8} chars of rst")
+        print(f"  parse_brief:        {new_time*1e3:8.2f} ms, {new_size:>8} chars of rst")
+        print(f"  ratio: {new_time/legacy_time:.2f}")
@@ -0,0 +1,180 @@
+#!/bin/python3
+
+# Measures how long docutils takes to parse each page generated by the converter, which is
+# the part of the sphinx build spent on the doxygen docs before writing html.
+# Reports per page the parse time, number of nodes and size, totals per output directory
+# (classes, templates, namespaces, enums), the worst pages and the cost of each directive.
+# Directives and roles of sphinx and sphinx-design (card, dropdown, tab-set, ref, ...) are
+# replaced by stubs parsing their content, so that neither sphinx nor a conf.py are needed:
+# times are a lower bound of what sphinx does (no cross-references, no html writing).
+# Pages with parse errors (which docutils may turn into a single error node) are reported, as their time is meaningless.
+# usage: python benchmarks/bench_render.py [output of the converter, directory or archive] [options]
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+try:
+    import docutils.utils
+    from docutils import nodes
+    import docutils.frontend
+    from docutils.parsers.rst import Parser, Directive, directives, roles
+    from docutils.parsers.rst.directives.body import CodeBlock, MathBlock
+    from docutils.parsers.rst.directives.images import Image
+except ImportError:
+    sys.exit("This benchmark needs docutils (installed with sphinx): pip install docutils")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from DoxygenToRST.RST_Output import is_archive, extract_archive
+
+
+# inclusive time and number of uses of each directive (nested directives are counted in their parent too),
+# over the first parse of each page
+directive_costs={}
+recording=True
+
+def timed(name, cls):
+    def run(self):
+        start=time.perf_counter()
+        result=cls.run(self)
+        if not recording:
+            return result
+        cost=directive_costs.setdefault(name, [0, 0.])
+        cost[0]+=1
+        cost[1]+=time.perf_counter()-start
+        return result
+    return type(cls.__name__, (cls,), {"run":run})
+
+# any option is accepted
+class Any_Option(dict):
+    def __missing__(self, key):
+        return directives.unchanged
+
+# sphinx and sphinx-design directives: a container with the parsed content
+class Stub_Directive(Directive):
+    optional_arguments=1
+    final_argument_whitespace=True
+    option_spec=Any_Option()
+    has_content=True
+
+    def run(self):
+        node=nodes.container()
+        if self.arguments:
+            node+=nodes.rubric(text=self.arguments[0])
+        self.state.nested_parse(self.content, self.content_offset, node)
+        return [node]
+
+stub_directives=["card", "dropdown", "tab-set", "tab-item", "button-ref", "digraph", "toctree", "only"]
+
+def stub_role(name, rawtext, text, lineno, inliner, options={}, content=[]):
+    return [nodes.reference(rawtext, text, refuri="#")], []
+
+def register_stubs():
+    for name in stub_directives:
+        directives.register_directive(name, timed(name, Stub_Directive))
+    for name, cls in [("code-block", CodeBlock), ("math", MathBlock), ("image", Image)]:
+        directives.register_directive(name, timed(name, cls))
+    for name in ["ref", "octicon"]:
+        roles.register_local_role(name, stub_role)
+
+def make_settings():
+    if hasattr(docutils.frontend, "get_default_settings"): # docutils>=0.18
+        settings=docutils.frontend.get_default_settings(Parser)
+    else:
+        settings=docutils.frontend.OptionParser(components=(Parser,)).get_default_values()
+    settings.report_level=5 # quiet, errors are counted from the document (see parse_page)
+    settings.halt_level=5
+    settings.warning_stream=open(os.devnull, "w")
+    return settings
+
+# best time over repeats, number of nodes, number of errors
+def parse_page(parser, settings, filename, text, repeats):
+    global recording
+    best=None
+    for i in range(repeats):
+        recording=(i==0)
+        document=docutils.utils.new_document(filename, settings)
+        start=time.perf_counter()
+        parser.parse(text, document)
+        elapsed=time.perf_counter()-start
+        best=elapsed if best is None else min(best, elapsed)
+    all_nodes=list(document.findall() if hasattr(document, "findall") else document.traverse()) # docutils<0.18
+    errors=sum(1 for node in all_nodes if isinstance(node, nodes.system_message) and node["level"]>=3)
+    return best, len(all_nodes), errors
+
+def bench(output, repeats):
+    parser=Parser()
+    settings=make_settings()
+    pages={}
+    for dirpath, dirnames, filenames in os.walk(output):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not filename.endswith(".rst"):
+                continue
+            path=os.path.join(dirpath, filename)
+            with open(path) as f:
+                text=f.read()
+            page=os.path.relpath(path, output)
+            elapsed, count, errors=parse_page(parser, settings, page, text, repeats)
+            pages[page]={"time":elapsed, "nodes":count, "bytes":len(text.encode()), "errors":errors}
+    return pages
+
+def totals_per_directory(pages):
+    totals={}
+    for page, data in pages.items():
+        directory=os.path.dirname(page) or "."
+        total=totals.setdefault(directory, {"pages":0, "time":0., "nodes":0, "bytes":0})
+        total["pages"]+=1
+        for key in ("time", "nodes", "bytes"):
+            total[key]+=data[key]
+    return totals
+
+def print_report(pages, totals, top):
+    print(f"{'directory':<20} {'pages':>7} {'time (s)':>10} {'nodes':>10} {'MB':>8} {'ms/page':>8}")
+    for directory, total in sorted(totals.items(), key=lambda item: -item[1]["time"]):
+        print(f"{directory:<20} {total['pages']:>7} {total['time']:>10.3f} {total['nodes']:>10} "
+              f"{total['bytes']/1e6:>8.2f} {total['time']/total['pages']*1e3:>8.2f}")
+    print(f"\n{top} slowest pages:")
+    print(f"{'time (ms)':>10} {'nodes':>8} {'kB':>8} {'us/node':>8}  page")
+    for page, data in sorted(pages.items(), key=lambda item: -item[1]["time"])[:top]:
+        print(f"{data['time']*1e3:>10.2f} {data['nodes']:>8} {data['bytes']/1e3:>8.1f} {data['time']/max(data['nodes'], 1)*1e6:>8.2f}  {page}")
+    print(f"\ndirectives (time including nested content and directives):")
+    print(f"{'directive':<12} {'count':>8} {'time (s)':>10} {'us/use':>8}")
+    for name, (count, elapsed) in sorted(directive_costs.items(), key=lambda item: -item[1][1]):
+        print(f"{name:<12} {count:>8} {elapsed:>10.3f} {elapsed/count*1e6:>8.1f}")
+    with_errors=[(page, data["errors"]) for page, data in pages.items() if data["errors"]>0]
+    if with_errors:
+        print(f"\nWARNING: {len(with_errors)} pages with parse errors, their times are not meaningful:")
+        for page, errors in with_errors[:top]:
+            print(f"{errors:>8} errors  {page}")
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description="Time the docutils parsing of the pages generated by DoxygenToRST")
+    parser.add_argument('output', nargs="?", default="./rst", help="Output of the converter: directory or archive")
+    parser.add_argument('--top', type=int, default=20, help="Number of slowest pages to list")
+    parser.add_argument('--repeats', type=int, default=1, help="Parse each page several times and keep the best time")
+    parser.add_argument('--json', help="Also write the results to this json file")
+    args=parser.parse_args()
+
+    register_stubs()
+    with tempfile.TemporaryDirectory() as tmp:
+        output=args.output
+        if is_archive(output):
+            extract_archive(output, tmp)
+            output=tmp
+        pages=bench(output, args.repeats)
+    if len(pages)==0:
+        sys.exit(f"No rst files in {args.output}")
+
+    totals=totals_per_directory(pages)
+    print_report(pages, totals, args.top)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"pages":pages, "directories":totals,
+                       "directives":{name:{"count":count, "time":elapsed} for name, (count, elapsed) in directive_costs.items()}},
+                      f, indent=1, sort_keys=True)
+        print(f"Results written to {args.json}")
@@ -0,0 +1,78 @@
+import contextlib
+import json
+import threading
+
+# Collects the warnings of a run instead of printing each of them.
+# Warnings are counted by category and by compound, and a summary is printed at the end.
+# verbosity:
+#   0: only the total number of warnings
+#   1: one line per category, with the compounds having the most warnings (default)
+#   2: also print every warning when it happens (old behaviour)
+# Safe to use from several threads. For several processes, send to_dict() of each worker
+# to the main process and merge() them.
+class Diagnostics:
+    max_examples=3 # messages kept per category for the summary and the report
+    max_compounds_in_summary=5
+
+    def __init__(self, verbosity=1):
+        self.verbosity=verbosity
+        self.categories={} # category -> {"origin", "count", "compounds": {compound: count}, "examples"}
+        self.lock=threading.Lock()
+        self.local=threading.local() # compound being converted, per thread
+
+    # all warnings emitted inside this block are attributed to compound
+    @contextlib.contextmanager
+    def in_compound(self, compound):
+        previous=getattr(self.local, "compound", None)
+        self.local.compound=compound
+        try:
+            yield self
+        finally:
+            self.local.compound=previous
+
+    def warn(self, origin, category, msg):
+        compound=getattr(self.local, "compound", None) or "<none>"
+        with self.lock:
+            cat=self.categories.setdefault(category, {"origin":origin, "count":0, "compounds":{}, "examples":[]})
+            cat["count"]+=1
+            cat["compounds"][compound]=cat["compounds"].get(compound, 0)+1
+            if len(cat["examples"])<self.max_examples:
+                cat["examples"].append(msg)
+        if self.verbosity>=2:
+            print(f"WARNING: about {origin} ({category}, in {compound}):")
+            print(msg)
+
+    def total(self):
+        return sum(cat["count"] for cat in self.categories.values())
+
+    def to_dict(self):
+        with self.lock:
+            return {"total":self.total(), "categories":json.loads(json.dumps(self.categories))}
+
+    def merge(self, other):
+        if isinstance(other, Diagnostics):
+            other=other.to_dict()
+        with self.lock:
+            for category, data in other["categories"].items():
+                cat=self.categories.setdefault(category, {"origin":data["origin"], "count":0, "compounds":{}, "examples":[]})
+                cat["count"]+=data["count"]
+                for compound, count in data["compounds"].items():
+                    cat["compounds"][compound]=cat["compounds"].get(compound, 0)+count
+                cat["examples"]+=data["examples"][:self.max_examples-len(cat["examples"])]
+        return self
+
+    def print_summary(self):
+        print(f"{self.total()} warnings")
+        if self.verbosity<1:
+            return
+        for category, cat in sorted(self.categories.items(), key=lambda item: -item[1]["count"]):
+            worst=sorted(cat["compounds"].items(), key=lambda item: -item[1])[:self.max_compounds_in_summary]
+            worst_txt=", ".join(f"{compound} ({count})" for compound, count in worst)
+            print(f"  {cat['count']:>7} {cat['origin']}/{category} in {len(cat['compounds'])} compounds: {worst_txt}")
+            if self.verbosity<2:
+                print(f"          e.g. {cat['examples'][0]}")
+
+    # json report, to track warnings from one run to the next
+    def write_report(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=1, sort_keys=True)
@@ -1,18 +1,40 @@
 #!/bin/python3
 
 import os
-import shutil
 import sys
 import argparse
+import json
+import functools
+import html
+import posixpath
+import threading
+import time
+import unicodedata
 
 import xml.etree.ElementTree as ET
 
 if __package__ is None or __package__ == '':
     # uses current directory visibility
-    from RST_Writer import RST_Writer
+    from RST_Writer import RST_Writer, sanitize_filename
+    from Diagnostics import Diagnostics
+    from Journal import Journal
+    from Symbols import Symbol_Table, External_Symbols, symbols_filename, make_html_anchor
+    from Profiles import load_profile
+    from Planner import Conversion_Stats, make_plan, print_plan, stats_filename
+    from Hierarchy import Class_Hierarchy
+    from Doxygen_Input import open_input
+    from RST_Output import open_output, as_output, is_archive, building_path, remove_path, swap_into_place
 else:
     # uses current package visibility
-    from .RST_Writer import RST_Writer
+    from .RST_Writer import RST_Writer, sanitize_filename
+    from .Diagnostics import Diagnostics
+    from .Journal import Journal
+    from .Symbols import Symbol_Table, External_Symbols, symbols_filename, make_html_anchor
+    from .Profiles import load_profile
+    from .Planner import Conversion_Stats, make_plan, print_plan, stats_filename
+    from .Hierarchy import Class_Hierarchy
+    from .Doxygen_Input import open_input
+    from .RST_Output import open_output, as_output, is_archive, building_path, remove_path, swap_into_place
 
 
 
@@ -28,21 +50,12 @@ subdir_classes="classes"
 subdir_templates="templates"
 subdir_enums="enums"
 subdir_namespaces="namespaces"
+subdir_images="images"
 
 
-DOXYGEN_INPUT=""
-
-
-def doxygen_warning(msg):
-    print("WARNING: about doxygen (might be ill formed):")
-    print(msg)
-
-def code_warning(msg):
-    print("WARNING: about code:")
-    print(msg)
-
 # sphinx refs are automatically converted to lowercase, alphanumeric only, with dashes between words.
 # I do it manually to avoid confusion.
+@functools.lru_cache(maxsize=65536) # same names come back for each reference to a class/method
 def make_ref(text):
     return_text=text
     
@@ -94,28 +107,374 @@ def remove_excess_white_spaces(txt):
         return_txt=return_txt.replace("  "," ")
     return return_txt
 
-def parse_brief(writer, brief_xml):
-    if brief_xml!=None:
-        for child in brief_xml:
-            if child.text:
-                writer+= make_cpp_code_to_text(remove_excess_white_spaces(child.text)) + " " or " "
-            for c in child:
-                # consider all possible types manually. some might be missing. also, depth might be higher than 2
-                # use operator+= and not add_line method because we may not want to start a new line.
-                # maybe I'm wrong on this
-                if c.tag=="ref":
-                    refid=c.get("refid")
-                    writer+= f":ref:`{make_cpp_code_to_text(c.text)} <{refid}>`" + " " # space at the end important because of remove_excess_white_spaces
-                if c.tag=="verbatim":
-                    writer+= make_cpp_code_to_text(remove_excess_white_spaces(c.text)) + " "
-                if c.tail: # tail contains the text after a child node and before the next child
-                    writer+= make_cpp_code_to_text(remove_excess_white_spaces(c.tail)) + " "
-        writer.newline()
+#######################################################
+### Descriptions (brief, detailed, ...)
+#######################################################
+# Descriptions are rendered in a single iterative walk over the xml, with one handler per tag
+# in description_handlers: enter(state, elem) returns True if the text and children of elem
+# must be walked, exit(state, elem) (may be None) is called after them.
+# Unknown tags are walked through, so that their text is kept.
+# Plain text is buffered and escaped once per run of text, when some markup must be written.
+
+# inline markup must be followed by whitespace or one of these characters (docutils rule),
+# e.g. not by the bracket of "<ref>compute</ref>()"
+inline_markup_followers="-.,:;!?\\/'\")]}>"
+
+def can_follow_inline_markup(char):
+    return (char.isspace() or char in inline_markup_followers
+            or unicodedata.category(char) in ("Pd", "Po", "Pe", "Pi", "Pf"))
+
+class Description_State:
+    def __init__(self, writer, session):
+        self.session=session
+        self.base_indent=writer.current_indent
+        self.indent=0
+        self.out=[] # rst, appended to the writer in one go at the end
+        self.directives=[]
+        self.buffer=[] # plain text not yet escaped
+        self.fresh=True # nothing written yet in the current block
+        self.after_inline=False # last thing written is inline markup
+        self.list_markers=[]
+
+    def write(self, txt):
+        self.out.append(txt)
+
+    def newline(self):
+        self.out.append("\n" + " "*4*(self.base_indent+self.indent))
+
+    def text(self, txt):
+        if txt:
+            self.buffer.append(txt)
+
+    def flush(self):
+        if len(self.buffer)==0:
+            return
+        txt=remove_excess_white_spaces("".join(self.buffer))
+        self.buffer=[]
+        if txt=="" or (self.fresh and txt.isspace()):
+            return
+        if self.fresh:
+            txt=txt.lstrip()
+        txt=make_cpp_code_to_text(txt)
+        if self.after_inline and not can_follow_inline_markup(txt[0]):
+            self.write("\\ ") # escaped space: ends the markup without adding a space
+        self.write(txt)
+        self.fresh=False
+        self.after_inline=False
+
+    # inline markup made from the text of an element, the whitespace around the text is kept as text
+    def inline_element(self, elem, make_markup):
+        txt=remove_excess_white_spaces(element_text(elem))
+        if txt.strip()=="":
+            self.text(txt)
+            return
+        if txt[0].isspace():
+            self.text(" ")
+        self.inline(make_markup(txt.strip()))
+        if txt[-1].isspace():
+            self.text(" ")
+
+    def inline(self, markup):
+        self.flush()
+        if not self.fresh and not self.out[-1][-1:].isspace():
+            self.write(" ")
+        self.write(markup)
+        self.fresh=False
+        self.after_inline=True
+
+    # start and end of a paragraph, list, code...
+    def block(self):
+        self.flush()
+        if not self.fresh:
+            self.newline()
+            self.newline()
+        self.fresh=True
+        self.after_inline=False
+
+    def end_block(self):
+        self.flush()
+        self.newline()
+        self.newline()
+        self.fresh=True
+        self.after_inline=False
+
+    # bold label followed by its content, on the same line
+    def label(self, txt):
+        self.block()
+        self.write(f"**{make_cpp_code_to_text(txt)}:** ")
+        self.fresh=True
+
+    # same as RST_Writer groups
+    def start_directive(self, name, title=""):
+        self.block()
+        self.write(f".. {name}:: {title}")
+        self.indent+=1
+        self.newline()
+        self.newline()
+        self.directives.append(name)
+
+    def end_directive(self, name):
+        cur=self.directives.pop()
+        if cur!=name:
+            raise Exception(f"Wrong directive closed: {name} instead of {cur}")
+        self.flush()
+        self.indent-=1
+        self.newline()
+        self.newline()
+        self.fresh=True
+        self.after_inline=False
+
+    def literal_block(self, directive, language, code):
+        code=code.strip("\n")
+        if code.strip()=="":
+            return
+        self.start_directive(directive, language)
+        for line in code.split("\n"):
+            self.write(line.rstrip())
+            self.newline()
+        self.end_directive(directive)
+
+# all the text of an element, without markup. <sp/> are spaces in program listings
+def element_text(elem):
+    out=[]
+    stack=[elem]
+    while stack:
+        item=stack.pop()
+        if isinstance(item, str):
+            out.append(item)
+            continue
+        if item.tag=="sp":
+            out.append(" ")
+        elif item.text:
+            out.append(item.text)
+        for child in reversed(item):
+            if child.tail:
+                stack.append(child.tail)
+            stack.append(child)
+    return "".join(out)
+
+def inline_text(elem):
+    return remove_excess_white_spaces(element_text(elem)).strip()
+
+def _enter_para(state, elem):
+    state.block()
+    return True
+
+def _exit_block(state, elem):
+    state.end_block()
+
+def _enter_listitem(state, elem):
+    state.block()
+    # body of the item aligned on the indentation of the writer
+    state.write("#.  " if state.list_markers[-1]=="#." else "-   ")
+    state.indent+=1
+    state.fresh=True
+    return True
+
+def _exit_listitem(state, elem):
+    state.flush()
+    state.indent-=1
+    state.newline()
+    state.fresh=True
+
+def _enter_list(marker):
+    def enter(state, elem):
+        state.block()
+        state.list_markers.append(marker)
+        return True
+    return enter
+
+def _exit_list(state, elem):
+    state.list_markers.pop()
+    state.end_block()
+
+parameterlist_titles={
+    "param":"Parameters",
+    "retval":"Return values",
+    "exception":"Exceptions",
+    "templateparam":"Template parameters",
+}
+
+def _enter_parameterlist(state, elem):
+    state.block()
+    title=parameterlist_titles.get(elem.get("kind"), "Parameters")
+    state.write(f"**{title}:**")
+    state.end_block()
+    state.list_markers.append("-")
+    return True
+
+def _enter_parameternamelist(state, elem):
+    names=[inline_text(name) for name in elem.iter("parametername")]
+    state.write(", ".join(f"``{name}``" for name in names if name) + ": ")
+    state.fresh=True
+    return False
+
+simplesect_labels={
+    "return":"Returns",
+    "see":"See also",
+    "pre":"Precondition",
+    "post":"Postcondition",
+    "invariant":"Invariant",
+    "since":"Since",
+    "author":"Author",
+    "authors":"Authors",
+    "version":"Version",
+    "date":"Date",
+    "copyright":"Copyright",
+    "remark":"Remark",
+    "rcs":"RCS",
+}
+# simplesect rendered as admonitions
+simplesect_directives={"note":"note", "warning":"warning", "attention":"attention", "important":"important", "todo":"note"}
+
+def _enter_simplesect(state, elem):
+    kind=elem.get("kind")
+    if kind in simplesect_directives:
+        state.start_directive(simplesect_directives[kind])
+    elif kind in simplesect_labels:
+        state.label(simplesect_labels[kind])
+    else: # "par": the title is rendered by its own handler
+        state.block()
+    return True
+
+def _exit_simplesect(state, elem):
+    kind=elem.get("kind")
+    if kind in simplesect_directives:
+        state.end_directive(simplesect_directives[kind])
+    else:
+        state.end_block()
+
+def _enter_title(state, elem):
+    txt=inline_text(elem)
+    if txt:
+        state.block()
+        state.write(f"**{make_cpp_code_to_text(txt)}**")
+        state.end_block()
+    return False
+
+def _enter_label(state, elem):
+    state.label(inline_text(elem))
+    return False
+
+def _enter_verbatim(state, elem):
+    state.literal_block("code-block", "text", element_text(elem))
+    return False
+
+def _enter_programlisting(state, elem):
+    state.literal_block("code-block", "cpp", "\n".join(element_text(line) for line in elem.iter("codeline")))
+    return False
+
+def _enter_formula(state, elem):
+    formula=(elem.text or "").strip()
+    if formula.startswith("$") and formula.endswith("$"):
+        state.inline(f":math:`{formula.strip('$').strip()}`")
+    elif formula:
+        if formula.startswith("\\[") and formula.endswith("\\]"):
+            formula=formula[2:-2]
+        state.literal_block("math", "", formula)
+    return False
+
+def _enter_ref(state, elem):
+    state.inline_element(elem, lambda txt: state.session.make_link(make_cpp_code_to_text(txt), elem.get("refid")))
+    return False
+
+def _enter_ulink(state, elem):
+    if inline_text(elem)=="":
+        state.inline(f"`{make_cpp_code_to_text(elem.get('url'))} <{elem.get('url')}>`__")
+    else:
+        state.inline_element(elem, lambda txt: f"`{make_cpp_code_to_text(txt)} <{elem.get('url')}>`__")
+    return False
+
+def _enter_computeroutput(state, elem):
+    state.inline_element(elem, lambda txt: f"``{txt}``")
+    return False
+
+def _enter_emphasis(mark):
+    def enter(state, elem):
+        state.inline_element(elem, lambda txt: f"{mark}{make_cpp_code_to_text(txt)}{mark}")
+        return False
+    return enter
+
+def _enter_symbol(char):
+    def enter(state, elem):
+        state.text(char)
+        return False
+    return enter
+
+def _skip(state, elem):
+    return False
+
+description_handlers={
+    "para":(_enter_para, _exit_block),
+    "itemizedlist":(_enter_list("-"), _exit_list),
+    "orderedlist":(_enter_list("#."), _exit_list),
+    "listitem":(_enter_listitem, _exit_listitem),
+    "parameterlist":(_enter_parameterlist, _exit_list),
+    "parameteritem":(_enter_listitem, _exit_listitem),
+    "parameternamelist":(_enter_parameternamelist, None),
+    "simplesect":(_enter_simplesect, _exit_simplesect),
+    "title":(_enter_title, None),
+    "heading":(_enter_title, None),
+    "xreftitle":(_enter_label, None),
+    "verbatim":(_enter_verbatim, None),
+    "preformatted":(_enter_verbatim, None),
+    "programlisting":(_enter_programlisting, None),
+    "formula":(_enter_formula, None),
+    "ref":(_enter_ref, None),
+    "ulink":(_enter_ulink, None),
+    "computeroutput":(_enter_computeroutput, None),
+    "bold":(_enter_emphasis("**"), None),
+    "emphasis":(_enter_emphasis("*"), None),
+    "linebreak":(_enter_symbol(" "), None),
+    "nonbreakablespace":(_enter_symbol(" "), None),
+    "ndash":(_enter_symbol("\u2013"), None),
+    "mdash":(_enter_symbol("\u2014"), None),
+    "lsquo":(_enter_symbol("\u2018"), None),
+    "rsquo":(_enter_symbol("\u2019"), None),
+    "ldquo":(_enter_symbol("\u201c"), None),
+    "rdquo":(_enter_symbol("\u201d"), None),
+    "anchor":(_skip, None),
+    "image":(_skip, None),
+    "indexentry":(_skip, None),
+    "htmlonly":(_skip, None),
+    "latexonly":(_skip, None),
+    "rtfonly":(_skip, None),
+    "manonly":(_skip, None),
+    "xmlonly":(_skip, None),
+    "docbookonly":(_skip, None),
+}
+
+def parse_brief(writer, brief_xml, session):
+    if brief_xml is None:
+        return writer
+    state=Description_State(writer, session)
+    # items: element to enter, (exit handler, element), or text (tail of an element)
+    stack=list(reversed(brief_xml))
+    while stack:
+        item=stack.pop()
+        if isinstance(item, str):
+            state.text(item)
+            continue
+        if isinstance(item, tuple):
+            leave, elem=item
+            leave(state, elem)
+            continue
+        enter, leave=description_handlers.get(item.tag, (None, None))
+        if item.tail:
+            stack.append(item.tail)
+        if enter is None or enter(state, item):
+            if leave is not None:
+                stack.append((leave, item))
+            state.text(item.text)
+            stack.extend(reversed(item))
+    state.flush()
+    writer+="".join(state.out)
+    writer.newline()
     return writer
 
 
 
-def parse_enum(writer, enum):
+def parse_enum(writer, enum, session):
     if enum.get("kind")!="enum" or enum.tag!="memberdef" :
         raise Exception(f"wrong enum xml")
     enum_xml_id=enum.get("id")
@@ -131,10 +490,11 @@ def parse_enum(writer, enum):
     
     if "@" in enum_qname:
         enum_qname=enum_qname.replace("@","")
-        code_warning(f"used anonymous enum in enum {enum_qname}, this syntax is kinda weird, I recommend changing it.")
+        session.code_warning(f"used anonymous enum in enum {enum_qname}, this syntax is kinda weird, I recommend changing it.", category="anonymous-enum")
     
     enum_ref=make_ref(f"enum-{enum_type}-{enum_qname}")
     writer.add_target(enum_xml_id)
+    session.symbols.add(enum_xml_id, "enum", enum_qname)
     writer.add_target(enum_ref)
     writer.start_section(make_cpp_code_to_text(enum_qname), mark="^")
     
@@ -142,9 +502,10 @@ def parse_enum(writer, enum):
     line=enum_loc.get("line")
     writer.add_line(f"**Location:** ``{loc_filename}:{line}``")
     
-    writer.newline().add_line(f"**How to cite in this doc:**")
-    
-    write_how_to_cite(writer, make_cpp_code_to_text(enum_qname), enum_ref)
+    if session.profile.how_to_cite:
+        writer.newline().add_line(f"**How to cite in this doc:**")
+        
+        write_how_to_cite(writer, make_cpp_code_to_text(enum_qname), enum_ref)
     
     
     writer.start_list("-")
@@ -154,6 +515,7 @@ def parse_enum(writer, enum):
         vn=make_cpp_code_to_text(val.find("name").text)
         writer.newline()
         writer.add_target(vid)
+        session.symbols.add(vid, "enumvalue", val.find("name").text)
         writer.add_list_item(vn)
     writer.end_list("-")
     writer.newline()
@@ -178,12 +540,77 @@ def write_how_to_cite(writer, link_text, link_target):
     writer.end_group("tab-item")
     writer.end_group("tab-set")
     
+# file of the page of a class
+def class_page_filename(class_name, is_template):
+    if is_template:
+        return f"{subdir_templates}/{class_name}.rst"
+    return f"{subdir_classes}/{class_name}.rst"
+
+# Lists of links (member summaries, bases, derived classes) can be written as pre-rendered html
+# (raw_html_lists in the profile): sphinx then neither parses their items nor resolves their refs,
+# which are thousands per page for big classes. Other builders get nothing, unless the rst list
+# is kept for them with rst_fallback_lists: sphinx parses and resolves it for every builder,
+# the html build is then not faster.
+# items: (text, refid, suffix) in plain text, refid may be empty (no link)
+# page: file of the page being written, to make relative urls
+# write_rst(writer): writes the rst list
+def write_link_list(writer, items, session, page, write_rst):
+    html_items=None
+    if session.profile.raw_html_lists:
+        html_items=[]
+        for text, refid, suffix in items:
+            url=session.html_url(refid, page) if refid else ""
+            if url is None: # not known yet, e.g. class converted later without hierarchy scan
+                html_items=None
+                break
+            text=html.escape(format_cpp_code(text))
+            if url:
+                text=f'<a class="reference internal" href="{html.escape(url)}"><span class="std std-ref">{text}</span></a>'
+            html_items.append(f"<li><p>{text}{html.escape(suffix)}</p></li>")
+    if html_items is None:
+        write_rst(writer)
+        return
+    
+    fallback=session.profile.rst_fallback_lists
+    if fallback:
+        writer.start_group("only", title="html")
+    writer.start_group("raw", title="html")
+    # one item per line: docutils rejects lines longer than 10000 characters
+    writer.add_line('<ul class="simple">')
+    for html_item in html_items:
+        writer.add_line(html_item)
+    writer.add_line("</ul>")
+    writer.end_group("raw")
+    if fallback:
+        writer.end_group("only")
+        writer.start_group("only", title="not html")
+        write_rst(writer)
+        writer.end_group("only")
+
+# Members of the sections left out by the profile (private members, friends) are not rendered, but
+# other pages may link to them (reimplements, references...): their labels are kept, on the page of
+# the class, so that these links still resolve. Labels cost nothing to render.
+def write_skipped_member_targets(writer, doc, class_name, session):
+    written=set()
+    for section in doc.findall("sectiondef"):
+        kind=section.get("kind")
+        if session.profile.includes_section(kind) and (kind!="friend" or session.profile.friends):
+            continue
+        for member in section:
+            targets=[(member.get("id"), member.get("kind"), f"{class_name}::{member.findtext('name')}")]
+            targets+=[(value.get("id"), "enumvalue", value.findtext("name")) for value in member.findall("enumvalue")]
+            for refid, member_kind, name in targets:
+                if refid and refid not in written:
+                    written.add(refid)
+                    writer.add_target(refid)
+                    session.symbols.add(refid, member_kind, name)
+
 # function which will convert an xml file describing a class into rst and write it to a file
 # can choose between two modes: single file for all classes (heavy and slow on the web) 
 # or one page per class (same as doxy html)
 # in the future, maybe i will switch to a two step parsing to improve quality
 # return name of written file, I may use that to cull unused file
-def convert_class_to_rst(file, output_dir):
+def convert_class_to_rst(file, output_dir, session):
     tree = ET.parse(file)
     root = tree.getroot()
     doc=root[0]
@@ -221,9 +648,12 @@ def convert_class_to_rst(file, output_dir):
     # class_ref aims to be more readable and stable, for reference to the doxygen doc in other part of the sphinx doc
     xml_class_ref=doc.get("id")
     class_ref=make_ref(f"{my_type} {class_name}")
+    filename=class_page_filename(class_name, is_template)
     
     rst_writer.add_target(xml_class_ref)
+    session.symbols.add(xml_class_ref, doc.get("kind"), class_name)
     rst_writer.add_target(class_ref)
+    write_skipped_member_targets(rst_writer, doc, class_name, session)
 
 
     rst_writer.start_section(make_cpp_code_to_text(class_name))
@@ -241,23 +671,25 @@ def convert_class_to_rst(file, output_dir):
     #######################################################
     brief=doc.find("briefdescription")
     rst_writer.start_group("card", title="Brief description")
-    parse_brief(rst_writer, brief)
+    parse_brief(rst_writer, brief, session)
     rst_writer.end_group("card")
     
     #######################################################
     ### How to cite
     #######################################################
-    rst_writer.start_section("How to reference this class", mark="-")
-    write_how_to_cite(rst_writer, make_cpp_code_to_text(class_name), class_ref)
+    if session.profile.how_to_cite:
+        rst_writer.start_section("How to reference this class", mark="-")
+        write_how_to_cite(rst_writer, make_cpp_code_to_text(class_name), class_ref)
     
     #######################################################
     ### Detailed description
     #######################################################
-    detail=doc.find("detaileddescription")
-    rst_writer.start_section("Detailed description", mark="-")
-    rst_writer.start_group("card")
-    parse_brief(rst_writer, detail)
-    rst_writer.end_group("card")
+    if session.profile.detailed_descriptions:
+        detail=doc.find("detaileddescription")
+        rst_writer.start_section("Detailed description", mark="-")
+        rst_writer.start_group("card")
+        parse_brief(rst_writer, detail, session)
+        rst_writer.end_group("card")
     
     
 
@@ -269,12 +701,13 @@ def convert_class_to_rst(file, output_dir):
         # writer.add_line(f"``{class_def.replace(" ","")}``")
         # writer.end_group("button-ref")
         # icon=" :octicon:`codescan;1em;sd-text-info` "
-        writer.add_line(f"- :ref:`{make_cpp_code_to_text(class_def)} <{class_ref}>` ({prot})")
+        writer.add_line(f"- {session.make_link(make_cpp_code_to_text(class_def), class_ref)} ({prot})")
         writer.newline()
     #######################################################
     ### Bases
     #######################################################
     list_elem_base=doc.findall("basecompoundref")
+    base_items=[]
     if len(list_elem_base)>0:
         rst_writer.start_section("Inherits from", mark="-")
         has_base=True
@@ -294,10 +727,15 @@ def convert_class_to_rst(file, output_dir):
             if ("std::" in base_name or # no ref to standard library
                 base_name in tparam_names_list or  # no ref if inherits from type given by template param
                 base_name == "Problem"): # no ref to Problem from ICoCo
-                write_heritage_ref(rst_writer, child.text, "", prot)
+                base_items.append((child.text, "", prot))
             else:
-                write_heritage_ref(rst_writer, child.text, base_refid, prot)
-            rst_writer.newline().newline()
+                base_items.append((child.text, base_refid, prot))
+        
+        def write_bases(writer):
+            for class_def, base_refid, prot in base_items:
+                write_heritage_ref(writer, class_def, base_refid, prot)
+                writer.newline().newline()
+        write_link_list(rst_writer, [(class_def, refid, f" ({prot})") for class_def, refid, prot in base_items], session, filename, write_bases)
             
         
     
@@ -305,6 +743,7 @@ def convert_class_to_rst(file, output_dir):
     ### Derived classes
     #######################################################
     list_elem_deriv=doc.findall("derivedcompoundref")
+    deriv_items=[]
     if len(list_elem_deriv)>0:
         rst_writer.start_section("Inherited by", mark="-")
         has_deriv=True
@@ -322,8 +761,13 @@ def convert_class_to_rst(file, output_dir):
                 
             deriv_ref=make_ref(f"{deriv_type} {deriv_name}")
             # rst_writer +=f"- {prot} : :ref:`{(deriv_name)} <{deriv_refid}>`"
-            write_heritage_ref(rst_writer, child.text, deriv_refid, prot)
-            rst_writer.newline().newline()
+            deriv_items.append((child.text, deriv_refid, prot))
+        
+        def write_derived(writer):
+            for class_def, deriv_refid, prot in deriv_items:
+                write_heritage_ref(writer, class_def, deriv_refid, prot)
+                writer.newline().newline()
+        write_link_list(rst_writer, [(class_def, refid, f" ({prot})") for class_def, refid, prot in deriv_items], session, filename, write_derived)
             
 
     
@@ -331,23 +775,25 @@ def convert_class_to_rst(file, output_dir):
     ### Graphs
     #######################################################
     # Method 1 : include image from doxygen html output
-    img=f"{DOXYGEN_INPUT}/html/class{class_name.replace("_","__")}__inherit__graph.png"
+    img=f"class{class_name.replace('_','__')}__inherit__graph.png"
     # image must be added only if it exists. Sometimes there is no class hierarchy because no inheritance
-    if os.path.exists(img):
+    if session.profile.inheritance_graph and img in session.doxygen_html_files():
         rst_writer.start_section("Inheritance graph", mark="-")
         rst_writer.add_line("If the image is too small, right-click and open in new tab")
         rst_writer.newline()
 
         img_ref=f"{make_ref(class_name)}-inherit-graph"
 
-        rst_writer.start_group("dropdown", title="How to reference this graph")
-        write_how_to_cite(rst_writer, f"{class_name} Inheritance Graph", img_ref)
-        rst_writer.end_group("dropdown")
+        if session.profile.how_to_cite:
+            rst_writer.start_group("dropdown", title="How to reference this graph")
+            write_how_to_cite(rst_writer, f"{class_name} Inheritance Graph", img_ref)
+            rst_writer.end_group("dropdown")
 
         rst_writer.add_target(img_ref)
-        # absolute image paths are searched by sphinx relative to top level source directory of the doc
-        img_path=img.replace("./","/")
-        rst_writer.add_line(f".. image:: {img_path}")
+        # the image is copied next to the pages, class pages being one directory below
+        img_path=session.add_asset(img)
+        rst_writer.start_group("image", title=f"../{img_path}", options={"loading":"lazy"})
+        rst_writer.end_group("image")
     
     # Method 2: generate from xml data with graphviz
     # not used because very slow. Might reconsider
@@ -395,9 +841,9 @@ def convert_class_to_rst(file, output_dir):
     
     for section in list_sections:
         key=section.get("kind")
-        if key in section_types:
+        if key in section_types and session.profile.includes_section(key):
             rst_writer.start_section(section_types[key][0], mark="-")
-            rst_writer.start_list("-")
+            summary_items=[]
             for member in section:
                 member_name=member.find("name").text
                 member_virtual=member.get("virtual")
@@ -448,7 +894,7 @@ def convert_class_to_rst(file, output_dir):
                     member_ref=make_ref(f"{class_name}-{member_prot}-{member_static}-{ref_name}-{args}")
                         
                         
-                    rst_writer.add_list_item(f":ref:`{print_name} <{xml_member_ref}>`")
+                    summary_items.append((member_name, xml_member_ref, ""))
                     
                     
                     # no custom ref to template specializations, only the one from doxygen
@@ -458,6 +904,7 @@ def convert_class_to_rst(file, output_dir):
                     # doxygen ref to template spec only on first occurence (limitation of doxygen, fixed in 1.14)
                     if not (is_template_specialization and (xml_member_ref in refs_template_spec)):
                         rst_list_all_members.add_target(f"{xml_member_ref}")
+                        session.symbols.add(xml_member_ref, "function", f"{class_name}::{member_name}")
                         refs_template_spec.add(xml_member_ref)
                     
                         
@@ -470,19 +917,19 @@ def convert_class_to_rst(file, output_dir):
                     rst_list_all_members.end_group("card")
                     
                     rst_list_all_members.start_group("card", title="Brief description")
-                    parse_brief(rst_list_all_members, member_brief)
+                    parse_brief(rst_list_all_members, member_brief, session)
                     rst_list_all_members.end_group("card")
                     
                     rst_list_all_members.newline().newline()
                     
-                    if member_detail!=None:
+                    if member_detail!=None and session.profile.detailed_descriptions:
                         rst_list_all_members.start_group("dropdown", title="Detailed description")
-                        parse_brief(rst_list_all_members, member_detail)
+                        parse_brief(rst_list_all_members, member_detail, session)
                         rst_list_all_members.end_group("dropdown")
                     
                     rst_list_all_members.newline().newline()
                     
-                    xml_list_reimplements=member.findall("reimplements")
+                    xml_list_reimplements=member.findall("reimplements") if session.profile.reimplements else []
                     if len(xml_list_reimplements)>0:
                         rst_list_all_members+="**Reimplements**:"
                         rst_list_all_members.start_list("-")
@@ -490,11 +937,11 @@ def convert_class_to_rst(file, output_dir):
                         for xml_ref_func in xml_list_reimplements:
                             refid=xml_ref_func.get("refid")
                             referenced_name=make_cpp_code_to_text(xml_ref_func.text)
-                            rst_list_all_members.add_list_item(f":ref:`{referenced_name} <{refid}>`")
+                            rst_list_all_members.add_list_item(session.make_link(referenced_name, refid))
                             
                         rst_list_all_members.end_list("-")
                     
-                    xml_list_references=member.findall("references")
+                    xml_list_references=member.findall("references") if session.profile.references else []
                     if len(xml_list_references)>0:
                         rst_list_all_members.start_group("dropdown", title="References")
                         rst_list_all_members.start_list("-")
@@ -502,12 +949,12 @@ def convert_class_to_rst(file, output_dir):
                         for xml_ref_func in xml_list_references:
                             refid=xml_ref_func.get("refid")
                             referenced_name=make_cpp_code_to_text(xml_ref_func.text)
-                            rst_list_all_members.add_list_item(f":ref:`{referenced_name} <{refid}>`")
+                            rst_list_all_members.add_list_item(session.make_link(referenced_name, refid))
                             
                         rst_list_all_members.end_list("-")
                         rst_list_all_members.end_group("dropdown")
                         
-                    xml_list_referencedby=member.findall("referencedby")
+                    xml_list_referencedby=member.findall("referencedby") if session.profile.referencedby else []
                     if len(xml_list_referencedby)>0:
                         rst_list_all_members.start_group("dropdown", title="Referenced By")
                         rst_list_all_members.start_list("-")
@@ -515,19 +962,53 @@ def convert_class_to_rst(file, output_dir):
                         for xml_ref_func in xml_list_referencedby:
                             refid=xml_ref_func.get("refid")
                             referenced_name=make_cpp_code_to_text(xml_ref_func.text)
-                            rst_list_all_members.add_list_item(f":ref:`{referenced_name} <{refid}>`")
+                            rst_list_all_members.add_list_item(session.make_link(referenced_name, refid))
                             
                         rst_list_all_members.end_list("-")
                         rst_list_all_members.end_group("dropdown")
                         
                     
-                    rst_list_all_members.start_group("dropdown", title="How to reference this method:")
-                    
-                    write_how_to_cite(rst_list_all_members, code_full_def, member_ref)
-                    rst_list_all_members.end_group("dropdown")
+                    if session.profile.how_to_cite:
+                        rst_list_all_members.start_group("dropdown", title="How to reference this method:")
+                        
+                        write_how_to_cite(rst_list_all_members, code_full_def, member_ref)
+                        rst_list_all_members.end_group("dropdown")
                     
                     rst_list_all_members.end_group("card")
-            rst_writer.end_list("-")
+            
+            def write_summary(writer):
+                writer.start_list("-")
+                for member_name, xml_member_ref, _ in summary_items:
+                    writer.add_list_item(f":ref:`{make_cpp_code_to_text(member_name)} <{xml_member_ref}>`")
+                writer.end_list("-")
+            write_link_list(rst_writer, summary_items, session, filename, write_summary)
+    
+    #######################################################
+    ### Inherited members
+    #######################################################
+    if session.hierarchy is not None:
+        inherited=[(owner, owner_name, [member for member in members if session.profile.includes_section(member[2])])
+                   for owner, owner_name, members in session.hierarchy.inherited_members(xml_class_ref)]
+        inherited=[item for item in inherited if len(item[2])>0]
+        upstream=[]
+        if len(session.external_symbols)>0: # bases can only be upstream with tag files
+            upstream=[(base, base_name) for base, base_name in session.hierarchy.unknown_bases(xml_class_ref)
+                      if session.external_symbols.url(base) is not None]
+        if len(inherited)>0 or len(upstream)>0:
+            rst_writer.start_section("Inherited Members", mark="-")
+            for base, base_name in upstream:
+                rst_writer.add_line(f"- Members of {session.make_link(make_cpp_code_to_text(base_name), base)}, documented upstream")
+                rst_writer.newline()
+            for owner, owner_name, members in inherited:
+                rst_writer.start_section(f"From {make_cpp_code_to_text(owner_name)}", mark="^")
+                items=[(member_name, member_refid, f" ({member_kind}, {member_prot})") for member_refid, member_kind, member_prot, member_name, _ in members]
+                
+                def write_inherited(writer):
+                    writer.start_list("-")
+                    for member_name, member_refid, suffix in items:
+                        writer.add_list_item(f"{session.make_link(make_cpp_code_to_text(member_name), member_refid)}{suffix}")
+                    writer.end_list("-")
+                write_link_list(rst_writer, items, session, filename, write_inherited)
             
     #######################################################
     ### Member attributes (of all categories)
@@ -544,7 +1025,7 @@ def convert_class_to_rst(file, output_dir):
     rst_list_all_attribs=RST_Writer(init_indent=0) 
     for section in list_sections:
         key=section.get("kind")
-        if key in attrib_section_types:
+        if key in attrib_section_types and session.profile.includes_section(key):
             for attrib in section:
                 attrib_name=attrib.find("name").text
                 attrib_type=attrib.find("type").text
@@ -561,12 +1042,13 @@ def convert_class_to_rst(file, output_dir):
                 attrib_detail=attrib.find("detaileddescription")
                 
                 rst_list_all_attribs.add_target(f"{attrib_xml_ref}")
+                session.symbols.add(attrib_xml_ref, "variable", f"{class_name}::{attrib_name}")
                 # ~ rst_list_all_attribs.add_target(f"{attrib_ref}")
                 rst_list_all_attribs.start_group("card", title=make_cpp_code_to_text(attrib_name) + f" ({attrib_prot})")
                 rst_list_all_attribs.start_group("code-block", title="cpp")
                 rst_list_all_attribs+=format_cpp_code(attrib_definition)
 
-                if attrib_initializer!=None:
+                if attrib_initializer!=None and session.profile.attribute_initializers:
                     init_lines=attrib_initializer.text.split("\n")
                     for line in init_lines:
                         rst_list_all_attribs+=format_cpp_code(line)
@@ -577,11 +1059,12 @@ def convert_class_to_rst(file, output_dir):
                 rst_list_all_attribs.end_group("code-block")
                 rst_list_all_attribs.newline()
                 
-                parse_brief(rst_list_all_attribs, attrib_brief)
+                parse_brief(rst_list_all_attribs, attrib_brief, session)
                 
                 rst_list_all_attribs.newline().newline()
                 
-                parse_brief(rst_list_all_attribs, attrib_detail)
+                if session.profile.detailed_descriptions:
+                    parse_brief(rst_list_all_attribs, attrib_detail, session)
                 rst_list_all_attribs.end_group("card")
     
 
@@ -607,7 +1090,7 @@ def convert_class_to_rst(file, output_dir):
     found_friends=False
     rst_friends=RST_Writer()
     for section in list_sections:
-        if section.get("kind") == "friend":
+        if section.get("kind") == "friend" and session.profile.friends:
             found_friends=True
             for member in section:
                 friend_id=member.get("id")
@@ -616,6 +1099,7 @@ def convert_class_to_rst(file, output_dir):
                 
                 rst_friends.start_list("-")
                 rst_friends.add_target(friend_id)
+                session.symbols.add(friend_id, "friend", friend_def)
                 rst_friends.add_list_item(f"{friend_def}")
                 
                 rst_friends.end_list("-")
@@ -638,11 +1122,11 @@ def convert_class_to_rst(file, output_dir):
     found_enums=False
     for section in list_sections:
         key=section.get("kind")
-        if key in type_section_types:
+        if key in type_section_types and session.profile.includes_section(key):
             for member in section:
                 if member.get("kind")=="enum":
                     found_enums=True
-                    parse_enum(rst_list_inner_enums,member)
+                    parse_enum(rst_list_inner_enums, member, session)
 
     #######################################################
     ### Inner enums
@@ -658,19 +1142,13 @@ def convert_class_to_rst(file, output_dir):
     ### Write to file
     #######################################################
     
-    filename=f"{output_dir}/{subdir_classes}/{class_name}.rst"
-    if is_template:
-        filename=f"{output_dir}/{subdir_templates}/{class_name}.rst"
-    
-    rst_writer.write_to_file(filename)
-    
     # return the name of written file
-    return (filename)
+    return session.write_page(rst_writer, output_dir, filename)
 
 
 
 # for namespaces
-def convert_namespace_to_rst(file, output_dir):
+def convert_namespace_to_rst(file, output_dir, session):
     tree = ET.parse(file)
     root = tree.getroot()
     doc=root[0]
@@ -689,18 +1167,19 @@ def convert_namespace_to_rst(file, output_dir):
     
     
     rst_writer.add_target(doxy_namespace_ref)
+    session.symbols.add(doxy_namespace_ref, "namespace", elem_name.text)
     rst_writer.add_target(namespace_ref)
     rst_writer.start_section(namespace_name)
     
     # Brief description
     brief=doc.find("briefdescription")
-    parse_brief(rst_writer, brief)
+    parse_brief(rst_writer, brief, session)
     
     # Detailed description
     detail=doc.find("detaileddescription")
-    if detail is not None:
+    if detail is not None and session.profile.detailed_descriptions:
         rst_writer.start_section("Detailed Description", mark="-")
-        parse_brief(rst_writer, detail)
+        parse_brief(rst_writer, detail, session)
     
     # Inner classes
     list_classes=doc.findall("innerclass")
@@ -710,7 +1189,7 @@ def convert_namespace_to_rst(file, output_dir):
             refid=inner_class.get("refid")
             prot=inner_class.get("prot")
             class_name=inner_class.text
-            rst_writer.add_line(f"- {prot} : :ref:`{class_name} <{refid}>`")
+            rst_writer.add_line(f"- {prot} : {session.make_link(class_name, refid)}")
         
     
     # Inner enums
@@ -721,7 +1200,7 @@ def convert_namespace_to_rst(file, output_dir):
         for section in sections:
             if section.get("kind")=="enum":
                 for enum in section:
-                    parse_enum(rst_writer_inner_enum,enum)
+                    parse_enum(rst_writer_inner_enum, enum, session)
                 
         rst_writer.append_rst(rst_writer_inner_enum)
         rst_writer.newline()
@@ -735,17 +1214,18 @@ def convert_namespace_to_rst(file, output_dir):
         rst_writer.add_line(f"- ``{loc_filename}:{line}``")
     
     ### Write the file
-    filename=f"{output_dir}/{subdir_namespaces}/{namespace_name}.rst".replace(" ", "_")
-    rst_writer.write_to_file(filename)
-    return (filename)
+    filename=f"{subdir_namespaces}/{namespace_name}.rst".replace(" ", "_")
+    return session.write_page(rst_writer, output_dir, filename)
     
 # for files
-def convert_filexml_to_rst(file, output_dir):
+def convert_filexml_to_rst(file, output_dir, session):
     tree = ET.parse(file)
     root = tree.getroot()
     doc=root[0]
     
     elem_name=doc.find("compoundname")
+    # attached to the first page written, so that upstream files are recognized by downstream projects
+    session.symbols.add(doc.get("id"), "file", elem_name.text)
     
     found_enums=False
     sections=doc.findall("sectiondef")
@@ -753,65 +1233,360 @@ def convert_filexml_to_rst(file, output_dir):
         if section.get("kind")=="enum":
             rst_writer_inner_enum=RST_Writer()
             for enum in section:
-                parse_enum(rst_writer_inner_enum,enum)
+                parse_enum(rst_writer_inner_enum, enum, session)
                 
                     
             ### Write the file
             
-            filename=f"{output_dir}/{subdir_enums}/{rst_writer_inner_enum.name}.rst"
-            rst_writer_inner_enum.write_to_file(filename)
+            filename=f"{subdir_enums}/{rst_writer_inner_enum.name}.rst"
+            session.write_page(rst_writer_inner_enum, output_dir, filename)
 
     # TODO: global functions should be defined here
 
 
 
-    
-def run(input=".", output="./rst", keeprst=False, test=False):
-    global DOXYGEN_INPUT
-    DOXYGEN_INPUT = input
 
-    DOXYGEN_XML=f"{DOXYGEN_INPUT}/xml"
-
-    if not keeprst and os.path.isdir(output):
-        print("Deleting RST files from doxygen")
-        shutil.rmtree(output)
-    else:
-        print("Keeping RST files from doxygen")
+# index.xml lists every member of every compound, so it is big for TRUST.
+# It is streamed instead of loaded: only compound entries of the wanted kinds are kept,
+# member children are dropped as soon as they are read.
+# returns the list of (kind, refid, name) of the compounds to convert, in index order
+# members: if given, filled with refid -> [(member refid, member kind)] for these compounds
+def read_doxygen_index(index_file, kinds, members=None):
+    compounds=[]
+    context=ET.iterparse(index_file, events=("start", "end"))
+    _, root=next(context)
+    compound=None
+    compound_members=[]
+    for event, elem in context:
+        if event=="start":
+            if elem.tag=="compound":
+                compound=elem
+                compound_members=[]
+            continue
+        if elem.tag=="member":
+            if members is not None:
+                compound_members.append((elem.get("refid"), elem.get("kind")))
+            compound.remove(elem)
+        elif elem.tag=="compound":
+            kind=elem.get("kind")
+            if kind in kinds:
+                compounds.append((kind, elem.get("refid"), elem.findtext("name")))
+                if members is not None:
+                    members[elem.get("refid")]=compound_members
+            root.clear()
+    return compounds
+
+def select_test_compound(compound, test_list):
+    kind, refid, name = compound
+    for s in test_list:
+        if s in refid.replace("__","_"):
+            print("Test mode: including", refid)
+            return True
+    return False
 
-    
-    if not os.path.exists(output):
-        os.makedirs(output)
+#######################################################
+### Converter session
+#######################################################
 
+# caches that several converters can share, e.g. when TRUST and TrioCFD are converted at the same time
+class Converter_Cache:
+    def __init__(self):
+        self.lock=threading.Lock()
+        self.external_symbols={} # (location, mtime) -> External_Symbols
+        self.html_files={} # (doxygen output, mtime) -> names of the files in html/
+
+    def get_external_symbols(self, location):
+        key=(location, os.path.getmtime(location.split("=", 1)[0]))
+        with self.lock:
+            if key not in self.external_symbols:
+                self.external_symbols[key]=External_Symbols().load(location)
+            return self.external_symbols[key]
+
+    # one scan of the html directory of a doxygen input instead of checking each file
+    def get_html_files(self, doxygen_input):
+        key=(doxygen_input.root, doxygen_input.mtime("html"))
+        with self.lock:
+            if key not in self.html_files:
+                self.html_files[key]=doxygen_input.listdir("html")
+            return self.html_files[key]
+
+# used by converters unless they are given their own
+SHARED_CACHE=Converter_Cache()
+
+# Everything about the conversion of one doxygen project: configuration, caches, symbols,
+# warnings and output. Converters do not share any state except their cache, so several of them
+# can run at the same time in one process, e.g. in a thread pool:
+#     pool.submit(Converter(input="trust", output="trust_rst").run)
+# See run() for the parameters.
+class Converter:
     converters={
     "class":convert_class_to_rst,
     "struct":convert_class_to_rst,
     "namespace":convert_namespace_to_rst,
     "file":convert_filexml_to_rst,
     }
-    
-    if test:
-        test_file='./.doxygen_test_list'
-        print(f"Reading list of patterns to include from {test_file}")
-        with open(test_file) as f:
-            test_list = f.read().splitlines()
-    
-    tree = ET.parse(f'{DOXYGEN_XML}/index.xml')
-    root = tree.getroot()
-    
-    for child in root:
-        for key in converters:
-            file_refid=child.get('refid')
-            file=f"{DOXYGEN_XML}/{file_refid}.xml"
-            if key==child.attrib["kind"]:
-                if not test:
-                    converters[key](file, output)
-                else:
-                    for s in test_list:
-                        if s in child.get("refid").replace("__","_"):
-                            print("Test mode: including", child.get("refid"))
-                            converters[key](file, output)
-                            break
 
+    def __init__(self, input=".", output="./rst", keeprst=False, test=False, keep_old=False, verbosity=1, report=None, resume=False, tagfiles=[], profile="full", cache=None):
+        self.input=input
+        # doxygen output: directory or tar archive, possibly compressed (see Doxygen_Input)
+        self.doxygen_input=open_input(input)
+        self.output=output
+        self.keeprst=keeprst
+        self.test=test
+        self.keep_old=keep_old
+        self.report=report
+        self.resume=resume
+        # sections of the pages to generate (see Profiles)
+        self.profile=load_profile(profile)
+        self.cache=cache if cache is not None else SHARED_CACHE
+
+        # warnings of the run, summarized at the end
+        self.diagnostics=Diagnostics(verbosity=verbosity)
+        # warnings of the compound being converted, journaled with it then merged into diagnostics
+        self.compound_diagnostics=None
+        # labels generated in the run, exported for downstream projects
+        self.symbols=Symbol_Table()
+        # symbols documented by upstream projects (from tag files), not converted again
+        self.external_symbols=External_Symbols()
+        for location in tagfiles:
+            self.external_symbols.merge(self.cache.get_external_symbols(location))
+        self.html_files=None
+        # base classes and members of all classes (see Hierarchy), when inherited members are listed
+        self.hierarchy=None
+        # members of the compounds from the index: refid -> [(member refid, kind)]
+        self.index_members={}
+        # cost of the compounds converted, exported to plan next runs (see Planner)
+        self.stats=Conversion_Stats()
+        self.compound_chars=0 # written for the compound being converted
+        self.compound_pages=0
+        # files added to the output (see add_asset): filename in the output -> name in the input
+        self.assets={}
+        self.compound_assets={} # added by the compound being converted, journaled with it
+
+    def warn(self, origin, category, msg):
+        diagnostics=self.compound_diagnostics if self.compound_diagnostics is not None else self.diagnostics
+        diagnostics.warn(origin, category, msg)
+
+    # about doxygen (might be ill formed)
+    def doxygen_warning(self, msg, category="doxygen"):
+        self.warn("doxygen", category, msg)
+
+    def code_warning(self, msg, category="code"):
+        self.warn("code", category, msg)
+
+    # names of the files in the html output of doxygen
+    def doxygen_html_files(self):
+        if self.html_files is None:
+            self.html_files=self.cache.get_html_files(self.doxygen_input)
+        return self.html_files
+
+    # add a file of the doxygen html output to the output, only once.
+    # It is copied (or hard linked) later by copy_assets: reading it in the middle of the
+    # conversion would make a compressed input go back and forth (see Doxygen_Input).
+    # returns its location relative to the output
+    def add_asset(self, html_filename):
+        filename=f"{subdir_images}/{html_filename}"
+        self.assets[filename]=self.compound_assets[filename]=f"html/{html_filename}"
+        return filename
+
+    # copy the files added with add_asset, in the order of the input
+    def copy_assets(self, output):
+        for filename, name in sorted(self.assets.items(), key=lambda item: self.doxygen_input.position(item[1])):
+            self.doxygen_input.copy_to(output, filename, name)
+
+    # link to a doxygen id: a sphinx ref, or a link to the upstream docs for external symbols
+    def make_link(self, text, refid):
+        url=self.external_symbols.url(refid)
+        if url is not None:
+            return f"`{text} <{url}>`__"
+        return f":ref:`{text} <{refid}>`"
+
+    # page (file without .rst) where a doxygen id is documented: already converted, on the page
+    # being generated, or from the hierarchy scan. None if unknown
+    def page_of(self, refid, page):
+        known=self.symbols.page_of(refid, page)
+        if known is not None or self.hierarchy is None:
+            return known
+        class_refid=self.hierarchy.owner_of(refid)
+        if class_refid is None:
+            return None
+        data=self.hierarchy.classes[class_refid]
+        return sanitize_filename(class_page_filename(data["name"], data["template"]))[:-len(".rst")]
+
+    # url of a doxygen id in the html docs, relative to the page being generated (see page_of).
+    # None if unknown
+    def html_url(self, refid, filename):
+        url=self.external_symbols.url(refid)
+        if url is not None:
+            return url
+        page=sanitize_filename(filename)[:-len(".rst")]
+        target=self.page_of(refid, page)
+        if target is None:
+            return None
+        anchor=make_html_anchor(refid)
+        if target==page:
+            return f"#{anchor}"
+        return f"{posixpath.relpath(target, posixpath.dirname(page))}.html#{anchor}"
+
+    # write a generated page and attach the symbols registered so far to it.
+    # On resume, compounds not journaled as done are converted again: their pages are replaced
+    def write_page(self, rst_writer, output_dir, filename):
+        output=as_output(output_dir)
+        self.compound_chars+=len(rst_writer.write_to(output, filename, force=self.resume))
+        self.compound_pages+=1
+        self.symbols.flush_page(sanitize_filename(filename)[:-len(".rst")])
+        return output.path(filename)
+
+    # an output ending with .zip, .tar, .tar.gz, ... is written as a single archive (always recreated)
+    # Unless previous files are kept, everything is generated next to the output and swapped
+    # in place at the end: the previous docs stay available during the whole run.
+    # The journal of converted compounds is kept in the generated directory, to resume from it.
+    # returns where to generate
+    def prepare_build(self):
+        output=self.output
+        if self.resume and is_archive(output):
+            print("An archive cannot be resumed, generating everything again")
+            self.resume=False
+        if self.keeprst and not is_archive(output):
+            print("Keeping RST files from doxygen")
+            if not os.path.exists(output):
+                os.makedirs(output)
+            return output
+
+        build=building_path(output)
+        if self.resume and os.path.isdir(build):
+            print(f"Resuming generation of RST files from doxygen in {build}")
+        else:
+            if self.resume:
+                print(f"Nothing to resume in {build}")
+            print(f"Generating RST files from doxygen in {build}")
+            remove_path(build) # leftover of an interrupted run
+            if not is_archive(output):
+                os.makedirs(build)
+        return build
+
+    # (kind, refid, name) of the compounds to convert
+    def select_compounds(self):
+        with self.doxygen_input.open("xml/index.xml") as index_file:
+            compounds=self.index_compounds=read_doxygen_index(index_file, self.converters, self.index_members)
+        if len(self.external_symbols)>0:
+            count=len(compounds)
+            compounds=[compound for compound in compounds if not self.external_symbols.is_external(*compound)]
+            print(f"{count-len(compounds)} compounds documented by upstream projects are not converted")
+        # compounds of the project itself, converted or not (test mode)
+        self.project_compounds=compounds
+        if self.test:
+            test_file='./.doxygen_test_list'
+            print(f"Reading list of patterns to include from {test_file}")
+            with open(test_file) as f:
+                test_list = f.read().splitlines()
+            compounds=[compound for compound in compounds if select_test_compound(compound, test_list)]
+        return compounds
+
+    # each compound is converted on its own: a failure is recorded and the run goes on.
+    # Compounds are converted in the order of the input (see Doxygen_Input.position)
+    def convert_compounds(self, compounds, journal, rst_output, build):
+        compounds=sorted(compounds, key=lambda compound: self.doxygen_input.position(f"xml/{compound[1]}.xml"))
+        for kind, file_refid, name in compounds:
+            if journal.is_done(file_refid):
+                continue
+            self.compound_chars=self.compound_pages=0
+            self.compound_assets={}
+            diagnostics=self.compound_diagnostics=Diagnostics(verbosity=self.diagnostics.verbosity)
+            failed=False
+            start=time.perf_counter()
+            with diagnostics.in_compound(name):
+                try:
+                    with self.doxygen_input.open(f"xml/{file_refid}.xml") as file:
+                        filename=self.converters[kind](file, rst_output, self)
+                except Exception as e:
+                    self.symbols.discard_compound()
+                    journal.record_failure(file_refid, name, e)
+                    self.code_warning(f"could not convert {name} ({file_refid}): {type(e).__name__}: {e}", category="conversion-failure")
+                    failed=True
+            self.compound_diagnostics=None
+            self.diagnostics.merge(diagnostics)
+            if failed:
+                continue
+            stats=[kind, len(self.index_members.get(file_refid, [])), self.compound_chars,
+                   time.perf_counter()-start, self.compound_pages]
+            self.stats.add(*stats)
+            if filename is not None:
+                filename=os.path.relpath(filename, build)
+            journal.record_done(file_refid, name, filename, self.symbols.take_compound(), stats, self.compound_assets,
+                                diagnostics.to_dict())
+
+    # dry run: predicts the output from the index and a sample of classes, nothing is written.
+    # calibration: doxygen_stats.json of a previous run (or its output directory), by default
+    # the one of the current output if any. report: json file to write the plan to
+    def plan(self, calibration=None, samples=100, report=None):
+        compounds=self.select_compounds()
+        if calibration is None and os.path.isfile(f"{self.output}/{stats_filename}"):
+            calibration=self.output
+        stats=Conversion_Stats.load(calibration) if calibration is not None else None
+        with self.doxygen_input:
+            plan=make_plan(self.doxygen_input, compounds, self.index_members, stats=stats, samples=samples,
+                           hierarchy_scan=self.profile.inherited_members)
+        print_plan(plan)
+        if report:
+            with open(report, "w") as f:
+                json.dump(plan, f, indent=1)
+            print(f"Plan written to {report}")
+        return plan
+
+    # returns the location of the previous output when keep_old is set (None otherwise)
+    def run(self):
+        build=self.prepare_build()
+        compounds=self.select_compounds()
+        if self.profile.inherited_members:
+            # all classes of the project, even if not converted (test mode).
+            # Upstream classes are not read again: their members are linked to as a whole
+            start=time.perf_counter()
+            self.hierarchy=Class_Hierarchy().scan(self.doxygen_input, self.project_compounds)
+            self.stats.set_hierarchy_scan(len(self.hierarchy.classes), time.perf_counter()-start)
+
+        journal=Journal(None if is_archive(self.output) else build, resume=self.resume)
+        if self.resume:
+            print(f"{len(journal.done)} compounds already converted")
+            for record in journal.done.values():
+                self.symbols.update(record.get("symbols", {}))
+                if record.get("stats"):
+                    self.stats.add(*record["stats"])
+                self.assets.update(record.get("assets", {}))
+                if record.get("diagnostics"):
+                    self.diagnostics.merge(record["diagnostics"])
+        with journal, open_output(build) as rst_output, self.doxygen_input:
+            self.convert_compounds(compounds, journal, rst_output, build)
+            self.copy_assets(rst_output)
+            write_index_files(rst_output)
+            rst_output.write(symbols_filename, self.symbols.export(), force=True)
+            rst_output.write(stats_filename, self.stats.export(self.profile.name), force=True)
+
+        old_output=None
+        if build!=self.output:
+            old_output=swap_into_place(build, self.output, keep_old=self.keep_old)
+            print(f"RST files from doxygen moved to {self.output}")
+
+        self.diagnostics.print_summary()
+        journal.print_failures()
+        if self.report:
+            self.diagnostics.write_report(self.report)
+            print(f"Warnings report written to {self.report}")
+        return old_output if self.keep_old else None
+
+# returns the location of the previous output when keep_old is set (None otherwise)
+# resume: continue an interrupted run, compounds recorded as done in its journal are not converted again
+# tagfiles: list of "file=url" (doxygen TAGFILES syntax) of upstream projects, either doxygen tag files
+# (url of their doxygen html) or symbols exported by this converter (url of their rst output).
+# Their compounds are not converted, links to them point to their docs.
+# profile: "full", "lean" or a json/toml file, sections of the pages to generate (see Profiles)
+def run(input=".", output="./rst", keeprst=False, test=False, keep_old=False, verbosity=1, report=None, resume=False, tagfiles=[], profile="full"):
+    converter=Converter(input=input, output=output, keeprst=keeprst, test=test, keep_old=keep_old,
+                        verbosity=verbosity, report=report, resume=resume, tagfiles=tagfiles, profile=profile)
+    return converter.run()
+
+# toctree files including all generated pages
+def write_index_files(rst_output):
     #######################################################
     ### Header files
     #######################################################
@@ -834,21 +1609,29 @@ def run(input=".", output="./rst", keeprst=False, test=False):
         writer.add_line(f"./{data[1]}/*")
         writer.end_group("toctree")
 
-        writer.write_to_file(f"{output}/{data[2]}", force=True)
+        writer.write_to(rst_output, data[2], force=True)
 
         doxy_writer.add_line(f"./{data[2]}")
     
     doxy_writer.end_group("toctree")
 
-    doxy_writer.write_to_file(f"{output}/index.rst", force=True)
+    doxy_writer.write_to(rst_output, "index.rst", force=True)
 
 
 def parse_args(argv):
     parser = argparse.ArgumentParser(description='Used to convert a xml tree generated by doxygen into rst format, for inclusion in a Sphinx documentation (much like breathe, but faster for big projects).')
                     
-    parser.add_argument('-i', '--input', default="./xml", help="Path to directory containing the xml generated by Doxygen") 
-    parser.add_argument('-o', '--output', default="./rst", help="Path to directory where rst files will be generated") 
+    parser.add_argument('-i', '--input', default="./xml", help="Doxygen output (with xml and html subdirectories): a directory, whose files may be compressed (.gz, .bz2, .xz), or a tar archive (.tar, .tar.gz, .tar.bz2, .tar.xz)") 
+    parser.add_argument('-o', '--output', default="./rst", help="Path to directory where rst files will be generated. If it ends with .zip, .tar, .tar.gz, .tgz, .tar.bz2 or .tar.xz, all files are written into this single archive instead (see RST_Output.extract_archive for the sphinx side)") 
     parser.add_argument('--keeprst', action='store_true', help="Option to keep previously generated rst. Default is deleting and regenerating all.")
+    parser.add_argument('--resume', action='store_true', help="Continue an interrupted run: compounds recorded as converted in its journal are skipped, failed ones are tried again.")
+    parser.add_argument('--tagfile', action='append', default=[], metavar="FILE=URL", help="Compounds of an upstream project to link to instead of converting them (can be repeated). FILE is a doxygen tag file, URL the location of its doxygen html; or FILE is the doxygen_symbols.json exported by this converter for the upstream project, URL the location of its rst output in the html docs.")
+    parser.add_argument('--profile', default="full", help="Sections of the pages to generate: 'full' (default), 'lean' (no private members, how-to-cite blocks, references/referenced by, attribute initializers nor friends), or a json/toml file with a 'profile' key and options to change (see Profiles.profile_options)")
+    parser.add_argument('--keep-old', action='store_true', help="Do not delete the previous rst files once the new ones are in place, they are moved next to the output (.old-*). Default is deleting them in the background.")
+    parser.add_argument('-v', '--verbosity', type=int, default=1, choices=[0, 1, 2], help="Warnings summary printed at the end: 0 total only, 1 per category (default), 2 also print every warning when it happens")
+    parser.add_argument('--report', default=None, help="Write a json report of the warnings (count by category and compound) to this file")
+    parser.add_argument('--plan', nargs="?", const="", default=None, metavar="REPORT.json", help="Dry run: estimate the pages, size and conversion time of the output without writing it, and optionally write the estimates to a json file")
+    parser.add_argument('--calibration', default=None, help="With --plan, the doxygen_stats.json written by a previous run (or its output directory) to calibrate the costs. Default: the one of the output, if any")
     parser.add_argument('--test', action='store_true', help="Option to run in test mode: only parse specific files. Sphinx will show a lot of warnings because of missing references. Mostly used to work on looks")
     
     args=parser.parse_args(argv)
@@ -858,11 +1641,15 @@ def parse_args(argv):
 
 if __name__ == "__main__":
     
-    args=parse_args(sys.argv[0:])
+    args=parse_args(sys.argv[1:])
 
     print(args)
 
-    run(input=args.input, output=args.output, keeprst=args.keeprst, test=args.test)   
+    if args.plan is not None:
+        converter=Converter(input=args.input, output=args.output, test=args.test, tagfiles=args.tagfile, profile=args.profile)
+        converter.plan(calibration=args.calibration, report=args.plan or None)
+    else:
+        run(input=args.input, output=args.output, keeprst=args.keeprst, test=args.test, keep_old=args.keep_old, verbosity=args.verbosity, report=args.report, resume=args.resume, tagfiles=args.tagfile, profile=args.profile)   
  
     
     
\ No newline at end of file
@@ -0,0 +1,147 @@
+import bz2
+import gzip
+import lzma
+import os
+import tarfile
+
+# where the doxygen output (xml/ and html/ directories) is read from.
+# Both kinds of input take filenames relative to the doxygen output, e.g. "xml/index.xml",
+# and open files for reading as binary streams, decompressed on the fly:
+# - a directory, where each file may be compressed on its own (xml/index.xml.gz, ...)
+# - a tar archive of the doxygen output (.tar, .tar.gz, .tar.bz2, .tar.xz), read without extracting it
+# zstd is not in the standard library: such archives must be recompressed with one of the above.
+
+# extension -> function opening a compressed file
+COMPRESSIONS={
+    ".gz":gzip.open,
+    ".bz2":bz2.open,
+    ".xz":lzma.open,
+}
+
+def remove_compression_suffix(name):
+    for ext in COMPRESSIONS:
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return name
+
+class Doxygen_Directory_Input:
+    def __init__(self, root):
+        self.root=root
+
+    # (path, None) for a plain file, (path, opener) for a compressed one, (None, None) if missing
+    def find(self, name):
+        path=f"{self.root}/{name}"
+        if os.path.exists(path):
+            return path, None
+        for ext, opener in COMPRESSIONS.items():
+            if os.path.exists(path + ext):
+                return path + ext, opener
+        return None, None
+
+    def exists(self, name):
+        return self.find(name)[0] is not None
+
+    def open(self, name):
+        path, opener=self.find(name)
+        if path is None:
+            raise FileNotFoundError(f"{self.root}/{name}")
+        return opener(path) if opener else open(path, "rb")
+
+    # names of the files of a directory, without compression suffix
+    def listdir(self, directory):
+        path=f"{self.root}/{directory}"
+        if not os.path.isdir(path):
+            return set()
+        with os.scandir(path) as entries:
+            return {remove_compression_suffix(entry.name) for entry in entries}
+
+    # to know when cached listings are outdated
+    def mtime(self, directory):
+        path=f"{self.root}/{directory}"
+        return os.path.getmtime(path) if os.path.exists(path) else None
+
+    # position of a file in the input, to read files in the best order: no order in a directory
+    def position(self, name):
+        return 0
+
+    # add a file of the input to an output (see RST_Output): plain files are linked, not read
+    def copy_to(self, output, filename, name):
+        path, opener=self.find(name)
+        if opener is None:
+            output.add_file(filename, path)
+        else:
+            with opener(path) as f:
+                output.add_file(filename, f)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# The list of members is read once when opening. In a compressed archive, going backward means
+# decompressing again from the start: files are read in the order of the archive (see position).
+class Doxygen_Tar_Input:
+    def __init__(self, archive):
+        self.root=archive
+        self.tar=tarfile.open(archive, "r:*")
+        members=[member for member in self.tar.getmembers() if member.isfile()]
+        # the doxygen output may be in a subdirectory of the archive
+        prefix=""
+        for member in members:
+            if remove_compression_suffix(member.name).endswith("xml/index.xml"):
+                prefix=member.name[:member.name.rindex("xml/index.xml")]
+                break
+        self.members={member.name[len(prefix):]:member for member in members if member.name.startswith(prefix)}
+        print(f"Reading doxygen output from {archive} ({len(self.members)} files)")
+
+    def find(self, name):
+        if name in self.members:
+            return self.members[name], None
+        for ext, opener in COMPRESSIONS.items():
+            if name + ext in self.members:
+                return self.members[name + ext], opener
+        return None, None
+
+    def exists(self, name):
+        return self.find(name)[0] is not None
+
+    def open(self, name):
+        member, opener=self.find(name)
+        if member is None:
+            raise FileNotFoundError(f"{self.root}/{name}")
+        f=self.tar.extractfile(member)
+        return opener(f) if opener else f
+
+    def listdir(self, directory):
+        directory=directory.rstrip("/") + "/"
+        return {remove_compression_suffix(name[len(directory):]) for name in self.members
+                if name.startswith(directory) and "/" not in name[len(directory):]}
+
+    def mtime(self, directory):
+        return os.path.getmtime(self.root)
+
+    def position(self, name):
+        member=self.find(name)[0]
+        return member.offset_data if member is not None else 0
+
+    def copy_to(self, output, filename, name):
+        with self.open(name) as f:
+            output.add_file(filename, f)
+
+    def close(self):
+        self.tar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_input(path):
+    if os.path.isfile(path) and tarfile.is_tarfile(path):
+        return Doxygen_Tar_Input(path)
+    return Doxygen_Directory_Input(path)
@@ -0,0 +1,153 @@
+import xml.etree.ElementTree as ET
+
+# Members inherited by each class, to list them on its page.
+# All class xml files of the project are scanned once before the conversion (bases and member
+# headers only), classes of upstream projects are not read again (see unknown_bases).
+# then the members visible from each class are computed once and reused by all its derived
+# classes, instead of walking up the hierarchy again for every leaf class.
+
+protection_order={"public":0, "protected":1, "private":2}
+
+# most restrictive of the protection of a member and of the inheritance
+def effective_protection(member_prot, inheritance_prot):
+    if protection_order.get(inheritance_prot, 0)>protection_order.get(member_prot, 0):
+        return inheritance_prot
+    return member_prot
+
+class Class_Hierarchy:
+    # sections whose members get a label on the class pages (see convert_class_to_rst):
+    # functions, attributes, and the enums of the sections of types (typedefs are not documented)
+    member_sections={f"{prot}-{static}{kind}" for prot in ("public", "protected", "private")
+                     for static in ("", "static-") for kind in ("func", "attrib")}
+
+    def is_documented(self, section, kind):
+        return section in self.member_sections or (kind=="enum" and section.endswith("-type"))
+
+    def __init__(self):
+        # refid -> {"name", "template", "bases": [(refid, prot, name)], "members": [(refid, kind, prot, name, owner)]}
+        self.classes={}
+        self.visible={} # refid -> {name: [members]}, memoized by visible_members
+        self.unknown={} # refid -> [(refid, name)], memoized by unknown_bases
+        self.owners={} # member refid -> class refid
+
+    # compounds: (kind, refid, name) of the project, including the ones not converted
+    # doxygen_input: see Doxygen_Input, files are read in its order
+    def scan(self, doxygen_input, compounds):
+        files=[f"xml/{refid}.xml" for kind, refid, name in compounds if kind in ("class", "struct")]
+        for file in sorted(files, key=doxygen_input.position):
+            if doxygen_input.exists(file):
+                with doxygen_input.open(file) as f:
+                    self.scan_class(f)
+        print(f"Read the hierarchy of {len(self.classes)} classes")
+        return self
+
+    # only the headers of the members are kept, their content is dropped as soon as it is read
+    def scan_class(self, file):
+        data={"name":None, "template":False, "bases":[], "members":[]}
+        refid=None
+        section=""
+        member_depth=0
+        for event, elem in ET.iterparse(file, events=("start", "end")):
+            if event=="start":
+                if elem.tag=="memberdef":
+                    member_depth+=1
+                elif elem.tag=="sectiondef":
+                    section=elem.get("kind") or ""
+                elif elem.tag=="compounddef":
+                    refid=elem.get("id")
+                continue
+            if elem.tag=="memberdef":
+                member_depth-=1
+                name=elem.findtext("name") or ""
+                if self.is_documented(section, elem.get("kind")) and not name.startswith("@"):
+                    data["members"].append((elem.get("id"), elem.get("kind"), elem.get("prot"), name, refid))
+                elem.clear()
+            elif elem.tag=="basecompoundref":
+                if elem.get("refid"):
+                    data["bases"].append((elem.get("refid"), elem.get("prot"), elem.text))
+            elif elem.tag=="compoundname":
+                data["name"]=elem.text
+            elif elem.tag=="templateparamlist" and member_depth==0:
+                data["template"]=True
+        if refid is not None:
+            self.classes[refid]=data
+            for member in data["members"]:
+                self.owners[member[0]]=refid
+
+    # class documenting a doxygen id (a class or one of its members), None if unknown
+    def owner_of(self, refid):
+        if refid in self.classes:
+            return refid
+        return self.owners.get(refid)
+
+    # constructors and destructors are not inherited
+    def is_inherited(self, refid, member):
+        short_name=self.classes[refid]["name"].split("::")[-1]
+        return member[3]!=short_name and not member[3].startswith("~")
+
+    # members of the bases of a class, with the protection they get in it: {name: [members]}
+    # A member declared in the class hides all the members of the bases with the same name.
+    # A member reached through several bases (diamond) is kept once, with the first protection.
+    def _from_bases(self, refid):
+        data=self.classes[refid]
+        own_names={member[3] for member in data["members"]}
+        inherited={}
+        seen=set()
+        for base, inheritance_prot, base_name in data["bases"]:
+            if base not in self.classes:
+                continue
+            for name, members in self.visible_members(base).items():
+                if name in own_names:
+                    continue
+                members=[member for member in members if member[0] not in seen]
+                if len(members)==0:
+                    continue
+                seen.update(member[0] for member in members)
+                if inheritance_prot!="public":
+                    members=[member[:2] + (effective_protection(member[2], inheritance_prot),) + member[3:] for member in members]
+                inherited.setdefault(name, []).extend(members)
+        return inherited
+
+    # (refid, name) of the bases of a class and of its ancestors that were not scanned (e.g. upstream),
+    # computed once per class like visible_members
+    def unknown_bases(self, refid):
+        if refid not in self.classes:
+            return []
+        if refid in self.unknown:
+            return self.unknown[refid]
+        self.unknown[refid]=[] # guard against cycles in ill-formed xml
+        unknown={}
+        for base, inheritance_prot, base_name in self.classes[refid]["bases"]:
+            if base in self.classes:
+                for item in self.unknown_bases(base):
+                    unknown.setdefault(item[0], item)
+            else:
+                unknown.setdefault(base, (base, base_name))
+        self.unknown[refid]=list(unknown.values())
+        return self.unknown[refid]
+
+    # members a derived class can access: own members and inherited ones, except private
+    def visible_members(self, refid):
+        if refid in self.visible:
+            return self.visible[refid]
+        self.visible[refid]={} # guard against cycles in ill-formed xml
+        visible={}
+        for name, members in self._from_bases(refid).items():
+            members=[member for member in members if member[2]!="private"]
+            if len(members)>0:
+                visible[name]=members
+        for member in self.classes[refid]["members"]:
+            if member[2]!="private" and self.is_inherited(refid, member):
+                visible.setdefault(member[3], []).append(member)
+        self.visible[refid]=visible
+        return visible
+
+    # returns [(owner refid, owner name, [members])] for the page of a class, grouped by the class declaring them
+    def inherited_members(self, refid):
+        if refid not in self.classes:
+            return []
+        by_owner={}
+        for members in self._from_bases(refid).values():
+            for member in members:
+                by_owner.setdefault(member[4], []).append(member)
+        return [(owner, self.classes[owner]["name"], members) for owner, members in by_owner.items()]
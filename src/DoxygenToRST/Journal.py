@@ -0,0 +1,79 @@
+import json
+import os
+import traceback
+
+# Records every compound once converted, one json object per line, in the output directory.
+# An interrupted run can then be resumed: compounds already done are skipped.
+# Failed compounds are recorded too (with their traceback) and retried on resume.
+# Without a directory (e.g. archive output, which cannot be resumed), it is only kept in memory.
+class Journal:
+    filename=".doxygen_journal.jsonl"
+
+    def __init__(self, directory=None, resume=False):
+        self.done={} # refid -> record
+        self.failed={} # refid -> record
+        self.path=None
+        self.file=None
+        if directory is None:
+            return
+        self.path=os.path.join(directory, self.filename)
+        if resume and os.path.exists(self.path):
+            self.load()
+        self.file=open(self.path, "a" if resume else "w")
+
+    def load(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record=json.loads(line)
+                except json.JSONDecodeError:
+                    continue # last line may be truncated if the run was killed
+                self._add(record)
+
+    def _add(self, record):
+        refid=record["refid"]
+        if record["status"]=="done":
+            self.done[refid]=record
+            self.failed.pop(refid, None)
+        else:
+            self.failed[refid]=record
+
+    def _write(self, record):
+        self._add(record)
+        if self.file is not None:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    def is_done(self, refid):
+        return refid in self.done
+
+    # symbols: labels of the compound (see Symbols), to export them again after a resume
+    # stats: cost of the compound (see Planner.Conversion_Stats.add), idem
+    # assets: files of the input copied to the output at the end of the run, to copy them after a resume too
+    # diagnostics: warnings of the compound (see Diagnostics.to_dict), to report them after a resume too
+    def record_done(self, refid, name, filename=None, symbols={}, stats=None, assets={}, diagnostics=None):
+        self._write({"refid":refid, "name":name, "status":"done", "file":filename, "symbols":symbols, "stats":stats,
+                     "assets":assets, "diagnostics":diagnostics})
+
+    # to be called from an except block
+    def record_failure(self, refid, name, error):
+        self._write({"refid":refid, "name":name, "status":"failed",
+                     "error":f"{type(error).__name__}: {error}", "traceback":traceback.format_exc()})
+
+    def print_failures(self):
+        if len(self.failed)==0:
+            return
+        print(f"{len(self.failed)} compounds could not be converted (details in {self.filename if self.path else 'the warnings report'}):")
+        for refid, record in self.failed.items():
+            print(f"  {record['name']} ({refid}): {record['error']}")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file=None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
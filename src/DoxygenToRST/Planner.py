@@ -0,0 +1,189 @@
+import json
+import os
+import time
+
+import xml.etree.ElementTree as ET
+
+# Dry run (--plan): predicts the size of the output and the conversion time without writing anything,
+# e.g. before upgrading doxygen or adding INPUT directories.
+# Each run records the cost of its compounds in doxygen_stats.json, in the output. The plan fits,
+# for each kind of compound, rst size and time as a linear function of its number of members
+# (read from index.xml), and applies it to the compounds of the new doxygen output.
+# Only index.xml and the beginning of a sample of class files are read.
+
+stats_filename="doxygen_stats.json"
+
+# used without calibration: rough orders of magnitude with the full profile
+default_factors={
+    "chars":(2500., 1500.), # (per compound, per member)
+    "seconds":(5e-4, 2e-4),
+}
+default_hierarchy_seconds=2e-4 # per class, scan before the conversion (inherited_members)
+
+# sums over the converted compounds of each kind, enough for a least squares fit
+class Conversion_Stats:
+    keys=("count", "members", "members2", "chars", "members_chars", "seconds", "members_seconds", "pages")
+
+    def __init__(self):
+        self.kinds={} # kind -> {key: sum}
+        self.hierarchy_scan=None # {"classes", "seconds"} when inherited members are listed
+        self.profile=None
+
+    def add(self, kind, members, chars, seconds, pages):
+        sums=self.kinds.setdefault(kind, dict.fromkeys(self.keys, 0))
+        sums["count"]+=1
+        sums["members"]+=members
+        sums["members2"]+=members*members
+        sums["chars"]+=chars
+        sums["members_chars"]+=members*chars
+        sums["seconds"]+=seconds
+        sums["members_seconds"]+=members*seconds
+        sums["pages"]+=pages
+
+    def set_hierarchy_scan(self, classes, seconds):
+        self.hierarchy_scan={"classes":classes, "seconds":seconds}
+
+    # per class
+    def hierarchy_seconds(self):
+        if self.hierarchy_scan is None or self.hierarchy_scan["classes"]==0:
+            return None
+        return self.hierarchy_scan["seconds"]/self.hierarchy_scan["classes"]
+
+    # (per compound, per member) cost of a kind for "chars" or "seconds", None without data
+    def fit(self, kind, key):
+        sums=self.kinds.get(kind)
+        if sums is None or sums["count"]==0:
+            return None
+        n=sums["count"]
+        det=n*sums["members2"]-sums["members"]**2
+        if det<=0: # all compounds with the same number of members
+            return (sums[key]/n, 0.)
+        slope=(n*sums[f"members_{key}"]-sums["members"]*sums[key])/det
+        slope=max(slope, 0.)
+        return ((sums[key]-slope*sums["members"])/n, slope)
+
+    def export(self, profile=None):
+        return json.dumps({"format":1, "profile":profile, "kinds":self.kinds, "hierarchy_scan":self.hierarchy_scan},
+                          indent=1, sort_keys=True)
+
+    # file written by a previous run, or an output directory containing it
+    @staticmethod
+    def load(path):
+        if os.path.isdir(path):
+            path=os.path.join(path, stats_filename)
+        with open(path) as f:
+            data=json.load(f)
+        stats=Conversion_Stats()
+        stats.kinds=data["kinds"]
+        stats.hierarchy_scan=data.get("hierarchy_scan")
+        stats.profile=data.get("profile")
+        return stats
+
+# whether a file defines enums outside of namespaces: the file converter writes a page for them
+def has_own_enums(refid, members):
+    return any(kind=="enum" and member_refid.startswith(f"{refid}_1") for member_refid, kind in members)
+
+# whether a class is a template, reading its xml up to its first section only
+def is_template_class(f):
+    for event, elem in ET.iterparse(f, events=("start",)):
+        if elem.tag=="templateparamlist":
+            return True
+        if elem.tag in ("sectiondef", "briefdescription"):
+            return False
+    return False
+
+# classes and templates share the same converter: their split is estimated on a sample of the xml
+def sample_template_ratio(doxygen_input, class_refids, samples):
+    if len(class_refids)==0 or samples<=0:
+        return 0.
+    step=max(1, len(class_refids)//samples)
+    sample=sorted(class_refids[::step][:samples], key=lambda refid: doxygen_input.position(f"xml/{refid}.xml"))
+    templates=0
+    for refid in sample:
+        with doxygen_input.open(f"xml/{refid}.xml") as f:
+            templates+=is_template_class(f)
+    return templates/len(sample)
+
+# compounds: (kind, refid, name) to convert, members: their members from the index (see read_doxygen_index)
+# stats: Conversion_Stats of a previous run, default costs if None
+# hierarchy_scan: whether all classes are scanned before the conversion (inherited_members)
+def make_plan(doxygen_input, compounds, members, stats=None, samples=100, top=20, hierarchy_scan=False):
+    start=time.perf_counter()
+
+    factors={}
+    for kind in {kind for kind, refid, name in compounds}:
+        factors[kind]={}
+        for key in ("chars", "seconds"):
+            fitted=stats.fit(kind, key) if stats is not None else None
+            factors[kind][key]=fitted if fitted is not None else default_factors[key]
+
+    class_refids=[refid for kind, refid, name in compounds if kind in ("class", "struct")]
+    template_ratio=sample_template_ratio(doxygen_input, class_refids, samples)
+
+    pages={"classes":0., "templates":0., "namespaces":0, "enums":0}
+    totals={"compounds":len(compounds), "members":0, "chars":0., "seconds":0.}
+    per_kind={}
+    costs=[]
+    for kind, refid, name in compounds:
+        compound_members=members.get(refid, [])
+        count=len(compound_members)
+        chars=factors[kind]["chars"][0]+factors[kind]["chars"][1]*count
+        seconds=factors[kind]["seconds"][0]+factors[kind]["seconds"][1]*count
+        if kind in ("class", "struct"):
+            pages["classes"]+=1-template_ratio
+            pages["templates"]+=template_ratio
+            costs.append((chars, name, count))
+        elif kind=="namespace":
+            pages["namespaces"]+=1
+        elif kind=="file" and has_own_enums(refid, compound_members):
+            pages["enums"]+=1
+        kind_total=per_kind.setdefault(kind, {"compounds":0, "members":0, "chars":0., "seconds":0.})
+        for total in (totals, kind_total):
+            total["members"]+=count
+            total["chars"]+=chars
+            total["seconds"]+=seconds
+        kind_total["compounds"]+=1
+
+    hierarchy_seconds=0.
+    if hierarchy_scan:
+        per_class=stats.hierarchy_seconds() if stats is not None else None
+        if per_class is None:
+            per_class=default_hierarchy_seconds
+        hierarchy_seconds=per_class*len(class_refids)
+        totals["seconds"]+=hierarchy_seconds
+
+    costs.sort(reverse=True)
+    return {
+        "calibrated":stats is not None,
+        "calibration_profile":getattr(stats, "profile", None),
+        "template_ratio":template_ratio,
+        "sampled_classes":min(samples, len(class_refids)),
+        "pages":{subdir:round(count) for subdir, count in pages.items()},
+        "totals":totals,
+        "kinds":per_kind,
+        "hierarchy_scan_seconds":hierarchy_seconds,
+        "factors":{kind:{key:list(value) for key, value in kind_factors.items()} for kind, kind_factors in factors.items()},
+        "largest_classes":[{"name":name, "members":count, "chars":round(chars)} for chars, name, count in costs[:top]],
+        "planning_seconds":time.perf_counter()-start, # without reading the index
+    }
+
+def print_plan(plan):
+    if plan["calibrated"]:
+        print(f"Plan calibrated on a previous run (profile {plan['calibration_profile']})")
+    else:
+        print(f"Plan with default costs: run a conversion once and give its {stats_filename} with --calibration for better estimates")
+    print(f"{'output directory':<20} {'pages':>8}")
+    for subdir, count in plan["pages"].items():
+        print(f"{subdir:<20} {count:>8}")
+    print(f"(templates estimated from {plan['sampled_classes']} sampled classes: {plan['template_ratio']:.1%})")
+    print(f"\n{'kind':<12} {'compounds':>10} {'members':>10} {'MB of rst':>10} {'time (s)':>10}")
+    for kind, total in sorted(plan["kinds"].items(), key=lambda item: -item[1]["chars"]):
+        print(f"{kind:<12} {total['compounds']:>10} {total['members']:>10} {total['chars']/1e6:>10.2f} {total['seconds']:>10.2f}")
+    if plan["hierarchy_scan_seconds"]>0:
+        print(f"{'class scan':<12} {'':>10} {'':>10} {'':>10} {plan['hierarchy_scan_seconds']:>10.2f}")
+    totals=plan["totals"]
+    print(f"{'total':<12} {totals['compounds']:>10} {totals['members']:>10} {totals['chars']/1e6:>10.2f} {totals['seconds']:>10.2f}")
+    print(f"\nlargest classes:")
+    print(f"{'members':>8} {'kB of rst':>10}  class")
+    for item in plan["largest_classes"]:
+        print(f"{item['members']:>8} {item['chars']/1e3:>10.1f}  {item['name']}")
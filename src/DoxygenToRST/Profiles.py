@@ -0,0 +1,77 @@
+import json
+import os
+import tomllib
+
+# Sections of the generated pages that can be turned off, to save build time when they are not needed
+# (e.g. internal API docs rebuilt on every commit). Turned off sections are skipped before rendering.
+profile_options={
+    "private_members":"private functions, attributes and types of classes",
+    "how_to_cite":"blocks with the rst/markdown code to cite classes, methods, enums and graphs",
+    "detailed_descriptions":"detailed descriptions of classes, namespaces, methods and attributes",
+    "reimplements":"list of reimplemented methods",
+    "references":"dropdown of the functions referenced by a method",
+    "referencedby":"dropdown of the functions referencing a method",
+    "attribute_initializers":"initial values of attributes",
+    "friends":"friends of classes",
+    "inheritance_graph":"inheritance graph images from the doxygen html",
+    "inherited_members":"members inherited from the base classes (needs a scan of all classes before the conversion)",
+    "raw_html_lists":"write lists of links (members, bases, derived classes) as pre-rendered html, faster to build with sphinx",
+    "rst_fallback_lists":"with raw_html_lists, also write these lists in rst for the builders other than html (parsed and resolved by sphinx for all builders)",
+}
+
+profiles={
+    # output of the converter before profiles existed
+    "full":dict({option:True for option in profile_options}, inherited_members=False, raw_html_lists=False, rst_fallback_lists=False),
+    "lean":{
+        "private_members":False,
+        "how_to_cite":False,
+        "detailed_descriptions":True,
+        "reimplements":True,
+        "references":False,
+        "referencedby":False,
+        "attribute_initializers":False,
+        "friends":False,
+        "inheritance_graph":True,
+        "inherited_members":False,
+        "raw_html_lists":False,
+        "rst_fallback_lists":False,
+    },
+}
+
+class Output_Profile:
+    def __init__(self, name="full", **options):
+        if name not in profiles:
+            raise Exception(f"Unknown profile {name}, expected one of {list(profiles)}")
+        self.name=name
+        for option, value in profiles[name].items():
+            setattr(self, option, value)
+        for option, value in options.items():
+            if option not in profile_options:
+                raise Exception(f"Unknown profile option {option}, expected one of {list(profile_options)}")
+            setattr(self, option, bool(value))
+
+    # doxygen sectiondef kinds (public-func, private-attrib, ...)
+    def includes_section(self, kind):
+        return self.private_members or not kind.startswith("private")
+
+    def options(self):
+        return {option:getattr(self, option) for option in profile_options}
+
+# a profile name, or a json/toml file based on a profile with some options changed, e.g.
+#     profile = "lean"
+#     friends = true
+def load_profile(profile):
+    if isinstance(profile, Output_Profile):
+        return profile
+    if profile in profiles:
+        return Output_Profile(profile)
+    if not os.path.exists(profile):
+        raise Exception(f"Unknown profile {profile}: neither one of {list(profiles)} nor a file")
+    if profile.endswith(".json"):
+        with open(profile) as f:
+            options=json.load(f)
+    else:
+        with open(profile, "rb") as f:
+            options=tomllib.load(f)
+    name=options.pop("profile", "full")
+    return Output_Profile(name, **options)
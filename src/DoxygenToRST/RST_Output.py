@@ -0,0 +1,289 @@
+import ctypes
+import io
+import os
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+
+# where the generated rst files go.
+# Both kinds of output take filenames relative to their root, e.g. "classes/Foo.rst"
+
+# extension of the archive -> (archive type, mode or compression)
+ARCHIVE_FORMATS={
+    ".zip":("zip", zipfile.ZIP_DEFLATED),
+    ".tar":("tar", "w"),
+    ".tar.gz":("tar", "w:gz"),
+    ".tgz":("tar", "w:gz"),
+    ".tar.bz2":("tar", "w:bz2"),
+    ".tar.xz":("tar", "w:xz"),
+}
+
+def archive_format(path):
+    for ext in ARCHIVE_FORMATS:
+        if path.endswith(ext):
+            return ARCHIVE_FORMATS[ext]
+    return None
+
+def is_archive(path):
+    return archive_format(path) is not None
+
+# one file per page in a directory tree (the classic mode)
+class RST_Directory_Output:
+    def __init__(self, root):
+        self.root=root
+        self.known_dirs=set() # avoid one stat per written page
+
+    def path(self, filename):
+        return f"{self.root}/{filename}"
+
+    def write(self, filename, text, force=False):
+        path=self.path(filename)
+        loc=os.path.dirname(path)
+        if loc not in self.known_dirs:
+            if not os.path.exists(loc):
+                print(f"mkdir {loc}")
+                os.makedirs(loc)
+            self.known_dirs.add(loc)
+
+        if force or not os.path.exists(path):
+            # written next to the page then renamed: a killed run never leaves a truncated page
+            tmp=f"{path}.part"
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, path)
+
+    # add an existing file (e.g. image): hard link when possible, copy otherwise.
+    # source is a path, or a binary file object (e.g. from a compressed input)
+    def add_file(self, filename, source):
+        path=self.path(filename)
+        loc=os.path.dirname(path)
+        if loc not in self.known_dirs:
+            os.makedirs(loc, exist_ok=True)
+            self.known_dirs.add(loc)
+        if os.path.exists(path):
+            return
+        if not isinstance(source, str):
+            with open(path, "wb") as f:
+                shutil.copyfileobj(source, f)
+            return
+        try:
+            os.link(source, path)
+        except OSError: # other filesystem, or links not supported
+            shutil.copyfile(source, path)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# every page is written straight into a single zip or tar file, no file is created on disk.
+# Useful for CI artifacts: uploading one file is much faster than tens of thousands of small ones.
+# An archive is always created anew, and each member is written only once.
+class RST_Archive_Output:
+    def __init__(self, archive):
+        fmt=archive_format(archive)
+        if fmt is None:
+            raise Exception(f"Unknown archive format for {archive}, expected one of {list(ARCHIVE_FORMATS)}")
+        self.root=archive
+        self.kind, self.mode=fmt
+        self.written=set()
+        self.mtime=time.time()
+
+        loc=os.path.dirname(archive)
+        if loc and not os.path.exists(loc):
+            os.makedirs(loc)
+        if self.kind=="zip":
+            self.archive=zipfile.ZipFile(archive, "w", compression=self.mode)
+        else:
+            self.archive=tarfile.open(archive, self.mode)
+
+    def path(self, filename):
+        return f"{self.root}/{filename}"
+
+    def write(self, filename, text, force=False):
+        filename=os.path.normpath(filename)
+        if filename in self.written:
+            return
+        self.written.add(filename)
+        data=text.encode("utf-8")
+        if self.kind=="zip":
+            info=zipfile.ZipInfo(filename, time.localtime(self.mtime)[:6])
+            info.compress_type=self.mode
+            self.archive.writestr(info, data)
+        else:
+            info=tarfile.TarInfo(filename)
+            info.size=len(data)
+            info.mtime=self.mtime
+            self.archive.addfile(info, io.BytesIO(data))
+
+    def add_file(self, filename, source):
+        filename=os.path.normpath(filename)
+        if filename in self.written:
+            return
+        self.written.add(filename)
+        if not isinstance(source, str):
+            data=source.read()
+            if self.kind=="zip":
+                info=zipfile.ZipInfo(filename, time.localtime(self.mtime)[:6])
+                self.archive.writestr(info, data, compress_type=zipfile.ZIP_STORED)
+            else:
+                info=tarfile.TarInfo(filename)
+                info.size=len(data)
+                info.mtime=self.mtime
+                self.archive.addfile(info, io.BytesIO(data))
+        elif self.kind=="zip":
+            self.archive.write(source, filename, compress_type=zipfile.ZIP_STORED) # images are already compressed
+        else:
+            self.archive.add(source, filename)
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_output(path):
+    if is_archive(path):
+        return RST_Archive_Output(path)
+    return RST_Directory_Output(path)
+
+# converters also accept a plain directory name
+def as_output(output):
+    if isinstance(output, str):
+        return RST_Directory_Output(output)
+    return output
+
+
+#######################################################
+### Atomic replacement of the output
+#######################################################
+# The output is generated in a sibling location then moved in place once complete,
+# so that a docs server never sees an empty or half written tree.
+
+# sibling location where the output is generated (keeps the archive extension)
+def building_path(path):
+    path=os.path.abspath(path)
+    return os.path.join(os.path.dirname(path), f".building-{os.path.basename(path)}")
+
+def remove_path(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+# Linux renameat2(RENAME_EXCHANGE) swaps two directories in a single atomic step.
+# returns False when not available (other OS, old kernel or filesystem not supporting it)
+def _exchange(path_a, path_b):
+    RENAME_EXCHANGE=2
+    AT_FDCWD=-100
+    try:
+        libc=ctypes.CDLL(None, use_errno=True)
+        renameat2=libc.renameat2
+    except (OSError, AttributeError):
+        return False
+    renameat2.argtypes=[ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    res=renameat2(AT_FDCWD, os.fsencode(path_a), AT_FDCWD, os.fsencode(path_b), RENAME_EXCHANGE)
+    return res==0
+
+# move the generated output from build to path.
+# returns the location of the previous output (None if there was none): it is deleted in a
+# background thread, unless keep_old is set, in which case it is left to the caller.
+def swap_into_place(build, path, keep_old=False):
+    path=os.path.abspath(path)
+    if not os.path.isdir(build) or not os.path.isdir(path):
+        # files (archives) and first generation: a plain rename is atomic
+        if os.path.isdir(path):
+            raise Exception(f"Cannot replace directory {path} with file {build}")
+        os.replace(build, path)
+        return None
+
+    old_base=os.path.join(os.path.dirname(path), f".old-{os.path.basename(path)}-{time.strftime('%Y%m%d-%H%M%S')}")
+    old=old_base
+    count=0
+    while os.path.lexists(old):
+        count+=1
+        old=f"{old_base}-{count}"
+    if _exchange(build, path):
+        os.rename(build, old)
+    else:
+        # fallback: two renames, the output is missing only between them
+        os.rename(path, old)
+        os.rename(build, path)
+
+    if keep_old:
+        print(f"Previous RST files kept in {old}")
+    else:
+        print(f"Deleting previous RST files in the background")
+        threading.Thread(target=shutil.rmtree, args=(old,), kwargs={"ignore_errors":True}).start()
+    return old
+
+
+#######################################################
+### Sphinx side
+#######################################################
+
+def _archive_members(archive):
+    if archive_format(archive) is None:
+        raise Exception(f"Unknown archive format for {archive}, expected one of {list(ARCHIVE_FORMATS)}")
+    if archive.endswith(".zip"):
+        with zipfile.ZipFile(archive) as z:
+            for info in z.infolist():
+                if not info.is_dir():
+                    yield info.filename, z.read(info)
+    else:
+        with tarfile.open(archive, "r|*") as t: # stream, no seek needed
+            for info in t:
+                if info.isfile():
+                    yield info.name, t.extractfile(info).read()
+
+# extract an archive produced by the converter into dest.
+# Files whose content did not change are not rewritten, so that their mtime is kept
+# and sphinx incremental builds do not reparse them.
+# returns the number of files written
+def extract_archive(archive, dest):
+    written=0
+    known_dirs=set()
+    for name, data in _archive_members(archive):
+        name=os.path.normpath(name)
+        if os.path.isabs(name) or name.split(os.sep)[0]=="..":
+            raise Exception(f"Refusing to extract {name} outside of {dest}")
+        path=os.path.join(dest, name)
+        loc=os.path.dirname(path)
+        if loc not in known_dirs:
+            os.makedirs(loc, exist_ok=True)
+            known_dirs.add(loc)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                if f.read()==data:
+                    continue
+        with open(path, "wb") as f:
+            f.write(data)
+        written+=1
+    return written
+
+# minimal sphinx extension: add "DoxygenToRST.RST_Output" to the extensions in conf.py and set
+#   doxygen_rst_archive = "path/to/rst.zip"
+#   doxygen_rst_dir = "doxygen" (relative to the source directory)
+# the archive is extracted before sphinx reads the sources
+def _extract_for_sphinx(app):
+    archive=app.config.doxygen_rst_archive
+    if not archive:
+        return
+    dest=os.path.join(app.srcdir, app.config.doxygen_rst_dir)
+    written=extract_archive(archive, dest)
+    print(f"DoxygenToRST: {written} files updated from {archive} into {dest}")
+
+def setup(app):
+    app.add_config_value("doxygen_rst_archive", "", "env")
+    app.add_config_value("doxygen_rst_dir", "doxygen", "env")
+    app.connect("builder-inited", _extract_for_sphinx)
+    return {"parallel_read_safe": True, "parallel_write_safe": True}
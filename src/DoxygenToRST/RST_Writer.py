@@ -135,10 +135,7 @@ class RST_Writer:
         return out
         
     def write_to_file(self, filename, force=False, mode="w"):
-        # sanitize filename just in case (with github artifact invalid chars)
-        invalid="\":<>|*?\r\n"
-        for chr in invalid:
-            filename=filename.replace(chr,"_")
+        filename=sanitize_filename(filename)
 
         loc=os.path.dirname(filename)
         if not os.path.exists(loc):
@@ -150,3 +147,17 @@ class RST_Writer:
             with open(filename, mode) as f:
                 f.write(self.printout())   
         return self.rst
+
+
+    # write to an output (directory or archive, see RST_Output), filename being relative to its root
+    def write_to(self, output, filename, force=False):
+        output.write(sanitize_filename(filename), self.printout(), force=force)
+        return self.rst
+
+
+# sanitize filename just in case (with github artifact invalid chars)
+def sanitize_filename(filename):
+    invalid="\":<>|*?\r\n"
+    for chr in invalid:
+        filename=filename.replace(chr,"_")
+    return filename
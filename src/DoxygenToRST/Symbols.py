@@ -0,0 +1,137 @@
+import json
+import re
+import unicodedata
+
+import xml.etree.ElementTree as ET
+
+# Symbols are the doxygen ids (refid) used as sphinx labels in the generated pages.
+# The table of the symbols of a run is exported with the rst files, so that a downstream project
+# (e.g. TrioCFD, which includes TRUST) can link to them instead of converting them again.
+
+symbols_filename="doxygen_symbols.json"
+
+# html id generated by docutils for a label (same as docutils.nodes.make_id)
+def make_html_anchor(label):
+    anchor=unicodedata.normalize("NFKD", label.lower()).encode("ascii", "ignore").decode("ascii")
+    anchor=re.sub("[^a-z0-9]+", "-", " ".join(anchor.split()))
+    return re.sub("^[-0-9]+|-+$", "", anchor)
+
+# symbols of the current run: refid -> [kind, name, page]
+# Symbols are added while a compound is converted, then attached to the page when it is written.
+class Symbol_Table:
+    def __init__(self):
+        self.symbols={}
+        self.pending={} # symbols of the page being generated: refid -> (kind, name)
+        self.compound={} # symbols of the compound being converted, over all its pages
+
+    def add(self, refid, kind, name):
+        self.pending[refid]=(kind, name)
+
+    # page: written file, relative to the output and without .rst
+    def flush_page(self, page):
+        for refid, (kind, name) in self.pending.items():
+            self.symbols[refid]=self.compound[refid]=[kind, name, page]
+        self.pending={}
+
+    # symbols of the compound just converted, e.g. for the journal
+    def take_compound(self):
+        symbols=self.compound
+        self.compound={}
+        self.pending={}
+        return symbols
+
+    # forget what a failed compound registered
+    def discard_compound(self):
+        for refid in self.take_compound():
+            del self.symbols[refid]
+
+    # page where a symbol is written, current_page for the symbols of the page being generated
+    def page_of(self, refid, current_page):
+        if refid in self.pending:
+            return current_page
+        if refid in self.symbols:
+            return self.symbols[refid][2]
+        return None
+
+    def update(self, symbols):
+        self.symbols.update(symbols)
+
+    def export(self):
+        return json.dumps({"format":1, "symbols":self.symbols}, sort_keys=True)
+
+# symbols documented by other projects: refid -> url of their documentation
+# Compounds listed here are not converted, and links to them point to the upstream docs.
+class External_Symbols:
+    def __init__(self):
+        self.urls={}
+        self.compound_names=set()
+
+    def __len__(self):
+        return len(self.urls)
+
+    def url(self, refid):
+        return self.urls.get(refid)
+
+    def merge(self, other):
+        self.urls.update(other.urls)
+        self.compound_names|=other.compound_names
+        return self
+
+    # namespaces are open and shared between projects: they are always converted
+    def is_external(self, kind, refid, name):
+        if kind=="namespace":
+            return False
+        return refid in self.urls or name in self.compound_names
+
+    # location given as doxygen TAGFILES: file=url (url of the docs of the project)
+    def load(self, location):
+        if "=" not in location:
+            raise Exception(f"Expected tagfile=url, got {location}")
+        filename, base_url=location.split("=", 1)
+        base_url=base_url.rstrip("/")
+        if filename.endswith(".json"):
+            self.load_symbols(filename, base_url)
+        else:
+            self.load_tagfile(filename, base_url)
+        return self
+
+    # symbols exported by a previous run of this converter, base_url being the url of its output
+    def load_symbols(self, filename, base_url):
+        with open(filename) as f:
+            data=json.load(f)
+        namespace_pages={page for kind, name, page in data["symbols"].values() if kind=="namespace"}
+        for refid, (kind, name, page) in data["symbols"].items():
+            if page in namespace_pages:
+                continue
+            self.urls[refid]=f"{base_url}/{page}.html#{make_html_anchor(refid)}"
+            if kind in ("class", "struct"):
+                self.compound_names.add(name)
+        print(f"Read {len(data['symbols'])} external symbols from {filename}")
+
+    # doxygen tag file, base_url being the url of the doxygen html of the project.
+    # doxygen xml ids are the html file names, with "_1" + anchor for members
+    def load_tagfile(self, filename, base_url):
+        def html(page):
+            return page if page.endswith(".html") else page + ".html"
+        count=0
+        context=ET.iterparse(filename, events=("end",))
+        for event, elem in context:
+            if elem.tag!="compound":
+                continue
+            kind=elem.get("kind")
+            page=elem.findtext("filename")
+            if kind!="namespace" and page:
+                refid=html(page)[:-len(".html")]
+                self.urls[refid]=f"{base_url}/{html(page)}"
+                if kind in ("class", "struct"):
+                    self.compound_names.add(elem.findtext("name"))
+                count+=1
+                for member in elem.iter():
+                    anchorfile=member.findtext("anchorfile") if member.tag=="member" else member.get("file")
+                    anchor=member.findtext("anchor") if member.tag=="member" else member.get("anchor")
+                    if anchorfile and anchor:
+                        member_page=html(anchorfile)
+                        self.urls[f"{member_page[:-len('.html')]}_1{anchor}"]=f"{base_url}/{member_page}#{anchor}"
+                        count+=1
+            elem.clear()
+        print(f"Read {count} external symbols from {filename}")
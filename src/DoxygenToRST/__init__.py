@@ -1 +1,2 @@
-from .DoxygenToRST import run
\ No newline at end of file
+from .DoxygenToRST import run, Converter, Converter_Cache
+from .RST_Output import extract_archive